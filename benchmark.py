@@ -0,0 +1,172 @@
+import argparse
+import json
+import logging
+import random
+import sys
+import time
+import tracemalloc
+from typing import Dict, List
+
+from chatarena.agent import Player
+from chatarena.config import BackendConfig
+from src.agents.scripted import ScriptedAgent  # noqa: F401 registers the scripted backends
+from src.arena import Arena
+from src.environments import ApplesToApples, Avalon, Bohnanza, Deliberation, Hanabi, OnceUponATime, PrisonersDilemma, PublicGood
+from src.environments.chameleon import ImprovedModerationChameleon
+
+try:
+    from src.environments.undercover import Undercover_Competition
+except ImportError as e:
+    logging.warning(f"Undercover_Competition is not importable, skipping it: {e}")
+    Undercover_Competition = None
+
+SCRIPTED_PARSER = {"backend": {"backend_type": "scripted-parser"}}
+# Games that only support some player counts; the others are skipped
+PLAYER_COUNTS = {"avalon": range(5, 11), "hanabi": range(2, 6), "apples_to_apples": range(3, 11), "bohnanza": range(3, 6)}
+
+
+def prisoner_payouts(num_players: int) -> Dict[str, Dict[str, int]]:
+    others = range(num_players)
+    return {
+        "cooperate": {f"{k}_others_cooperate": 2 * k + 1 for k in others},
+        "defect": {f"{k}_others_cooperate": 2 * k + 2 for k in others},
+    }
+
+
+def make_environment(game: str, player_names: List[str], num_steps: int, large_n: bool = False):
+    rounds = max(1, num_steps // len(player_names))
+    if game == "once_upon_a_time":
+        return OnceUponATime(player_names, parser=SCRIPTED_PARSER)
+    if game == "prisoner":
+        return PrisonersDilemma(player_names=player_names, payouts=prisoner_payouts(len(player_names)), total_rounds=rounds, parser=SCRIPTED_PARSER,
+                                large_n=large_n)
+    if game == "public_good":
+        return PublicGood(player_names=player_names, interest_multiplier=2.0, total_rounds=rounds, parser=SCRIPTED_PARSER, large_n=large_n)
+    if game == "chameleon":
+        return ImprovedModerationChameleon(player_names=player_names, parser=SCRIPTED_PARSER)
+    if game == "undercover_competition":
+        competition = {"random": True, "undercover": {"model": "scripted"}, "non-undercover": {"model": "scripted"}, "add_pgm_metric": False}
+        return Undercover_Competition(player_names=player_names, topic_codes=[["Apple", "Pear"], ["Lion", "Tiger"]], competition=competition)
+    if game == "avalon":
+        return Avalon(player_names=player_names, parser=SCRIPTED_PARSER)
+    if game == "hanabi":
+        return Hanabi(player_names=player_names)
+    if game == "apples_to_apples":
+        return ApplesToApples(player_names=player_names)
+    if game == "bohnanza":
+        return Bohnanza(player_names=player_names)
+    if game == "deliberation":
+        return Deliberation(player_names=player_names, topic="Should the town build a new library or a new park?",
+                            options=["library", "park"], max_rounds=max(1, num_steps // len(player_names)))
+    raise ValueError(f"Unknown game: {game}")
+
+
+def make_arena(game: str, num_players: int, num_steps: int, seed: int, large_n: bool = False) -> Arena:
+    random.seed(seed)
+    player_names = [f"Player {i + 1}" for i in range(num_players)]
+    players = [
+        Player(name=name, role_desc=f"You are {name}.", backend=BackendConfig(backend_type="scripted", game=game, seed=seed + i))
+        for i, name in enumerate(player_names)
+    ]
+    return Arena(players, make_environment(game, player_names, num_steps, large_n))
+
+
+def run_steps(arena: Arena, num_steps: int) -> None:
+    for _ in range(num_steps):
+        if arena.step().terminal:
+            arena.reset()
+
+
+def benchmark(game: str, num_players: int, num_steps: int, seed: int = 0, large_n: bool = False) -> Dict[str, float]:
+    """Runs `num_steps` scripted steps and measures throughput, observation cost and memory."""
+    arena = make_arena(game, num_players, num_steps, seed, large_n)
+    environment = arena.environment
+    get_observation = environment.get_observation
+    observation_time = [0.0, 0]
+
+    def timed_get_observation(player_name=None):
+        start = time.perf_counter()
+        observation = get_observation(player_name)
+        observation_time[0] += time.perf_counter() - start
+        observation_time[1] += 1
+        return observation
+
+    environment.get_observation = timed_get_observation
+    start = time.perf_counter()
+    run_steps(arena, num_steps)
+    elapsed = time.perf_counter() - start
+
+    # Second, identical run under tracemalloc so tracing overhead does not skew the timings. What the game still
+    # holds at the end, per step, shows state growing with its length; it is not a count of allocations
+    arena = make_arena(game, num_players, num_steps, seed, large_n)
+    tracemalloc.start()
+    run_steps(arena, num_steps)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "steps_per_sec": num_steps / elapsed,
+        "observation_us": 1e6 * observation_time[0] / max(observation_time[1], 1),
+        "observation_share": observation_time[0] / elapsed,
+        "retained_bytes_per_step": retained / num_steps,
+        "peak_bytes": peak,
+    }
+
+
+# Metrics where a higher value is a regression; steps_per_sec regresses when it drops
+HIGHER_IS_WORSE = ("observation_us", "retained_bytes_per_step", "peak_bytes")
+
+
+def find_regressions(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    regressions = []
+    for key, metrics in results.items():
+        if key not in baseline:
+            continue
+        for metric, value in metrics.items():
+            before = baseline[key].get(metric)
+            if not before or metric == "observation_share":
+                continue
+            change = (value - before) / before
+            if metric not in HIGHER_IS_WORSE:
+                change = -change
+            if change > tolerance:
+                regressions.append(f"{key} {metric}: {before:.1f} -> {value:.1f} ({change:+.0%} worse)")
+    return regressions
+
+
+if __name__ == '__main__':
+    games = ["once_upon_a_time", "prisoner", "public_good", "chameleon", "avalon", "hanabi", "apples_to_apples", "deliberation", "bohnanza"]
+    if Undercover_Competition is not None:
+        games.append("undercover_competition")
+    argparser = argparse.ArgumentParser(description="Scripted-agent throughput benchmark for the game engines.")
+    argparser.add_argument("--games", nargs="+", default=games, choices=games)
+    argparser.add_argument("--players", nargs="+", type=int, default=[3, 6, 12])
+    argparser.add_argument("--steps", nargs="+", type=int, default=[50, 200, 800])
+    argparser.add_argument("--seed", type=int, default=0)
+    argparser.add_argument("--large-n", action="store_true", help="run the round games in large-N mode")
+    argparser.add_argument("--save", help="write the results to this json file as a new baseline")
+    argparser.add_argument("--baseline", help="compare against a baseline json file and flag regressions")
+    argparser.add_argument("--tolerance", type=float, default=0.25, help="relative slowdown that counts as a regression")
+    args = argparser.parse_args()
+
+    results = {}
+    print(f"{'benchmark':<36}{'steps/s':>12}{'obs us':>10}{'obs %':>8}{'kept B/step':>13}{'peak KiB':>10}")
+    for game in args.games:
+        for num_players in args.players:
+            if num_players not in PLAYER_COUNTS.get(game, [num_players]):
+                continue
+            for num_steps in args.steps:
+                key = f"{game}/{num_players}p/{num_steps}s" + ("/large-n" if args.large_n else "")
+                metrics = results[key] = benchmark(game, num_players, num_steps, args.seed, args.large_n)
+                print(f"{key:<36}{metrics['steps_per_sec']:>12.0f}{metrics['observation_us']:>10.1f}{metrics['observation_share']:>8.0%}"
+                      f"{metrics['retained_bytes_per_step']:>13.0f}{metrics['peak_bytes'] / 1024:>10.0f}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=4)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
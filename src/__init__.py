@@ -1,2 +1,3 @@
+from .backends import OpenAIChat
 from .agents import ReActWrapper
 from .environments import Chameleon
@@ -1 +1,3 @@
-from .react import ReActWrapper
\ No newline at end of file
+from .context import ContextWindow
+from .react import ReActWrapper
+from .scripted import ScriptedAgent, ScriptedParser
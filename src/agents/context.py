@@ -0,0 +1,106 @@
+from typing import Dict, List, Optional
+
+from chatarena.backends import load_backend
+from chatarena.config import BackendConfig
+from chatarena.message import SYSTEM_NAME, Message
+
+from ..tokens import message_tokens, prompt_history
+
+SUMMARY_PROMPT = """You are keeping notes for {agent_name}, a player in a game.
+Previous notes:
+{summary}
+
+New events:
+{events}
+
+Rewrite the notes to include the new events. Keep every fact {agent_name} may need later (scores, cards, claims, votes and who did what), drop small talk, and answer with the notes only."""
+
+
+class ContextWindow:
+    """Sliding window of recent history messages plus a rolling summary of everything before it.
+
+    The summary is refreshed at most every `summarize_every` turns by folding the messages that left the
+    window into the previous summary, so a prompt never holds more than `window` messages plus those of the
+    last few turns. With `window_tokens`, the window also holds no more than that many tokens; counts
+    are cached on each message, so every message is tokenized once. `backend` is the config of the
+    summarizing backend; by default the player's own backend is used. The system and role prompts are
+    built by the backend and are always sent in full. A token budget running down lowers `limit`, which
+    shrinks the window below `window` messages.
+    """
+
+    def __init__(self, window: int = 12, summarize_every: int = 4, window_tokens: Optional[int] = None,
+                 backend: Optional[dict] = None):
+        self.window = window
+        self.window_tokens = window_tokens
+        self.summarize_every = summarize_every
+        self.summarizer = load_backend(BackendConfig(**backend)) if backend else None
+        self.limit: Optional[int] = None
+        self.reset()
+
+    def reset(self):
+        self.summary: Optional[str] = None
+        self.summarized = 0  # number of leading history messages covered by the summary
+        self.last_summarized: Optional[str] = None  # hash of the last of them, to notice a new game
+        self.turns = 0
+
+    def _window_start(self, history_messages: List[Message], model: Optional[str]) -> int:
+        start = len(history_messages) - (self.window if self.limit is None else min(self.window, self.limit))
+        if self.window_tokens is not None:
+            tokens, index = 0, len(history_messages)
+            while index > max(start, self.summarized, 0):
+                tokens += message_tokens(history_messages[index - 1], model)
+                if tokens > self.window_tokens:
+                    break
+                index -= 1
+            start = max(start, index)
+        return start
+
+    def _pending(self, history_messages: List[Message], model: Optional[str] = None) -> List[Message]:
+        """The messages to fold into the summary this turn, if it is time to refresh it."""
+        if self.summarized and (self.summarized > len(history_messages)
+                                or history_messages[self.summarized - 1].msg_hash != self.last_summarized):
+            self.reset()
+        self.turns += 1
+        if self.turns < self.summarize_every:
+            return []
+        return history_messages[self.summarized:self._window_start(history_messages, model)]
+
+    def _fold(self, history_messages: List[Message], pending: List[Message], summary: str):
+        self.summary = summary.strip()
+        self.summarized += len(pending)
+        self.last_summarized = history_messages[self.summarized - 1].msg_hash
+        self.turns = 0
+
+    def _window(self, history_messages: List[Message]) -> List[Message]:
+        recent = history_messages[self.summarized:]
+        if self.summary is None:
+            return recent
+        return [Message(SYSTEM_NAME, f"Summary of earlier events: {self.summary}", 0)] + recent
+
+    def summary_prompt(self, agent_name: str, pending: List[Message]) -> List[Dict[str, str]]:
+        events = "\n".join(f"[{message.agent_name}]: {message.content}" for message in pending)
+        prompt = SUMMARY_PROMPT.format(agent_name=agent_name, summary=self.summary or "(none yet)", events=events)
+        return [{"role": "system", "content": "You are a helpful assistant"}, {"role": "user", "content": prompt}]
+
+    def apply(self, backend, agent_name: str, history_messages: List[Message]) -> List[Message]:
+        """The history to send instead of `history_messages`, summarizing with `backend` unless a summarizer is configured."""
+        pending = self._pending(history_messages, getattr(backend, "model", None))
+        if pending:
+            summarizer = self.summarizer or backend
+            with prompt_history(None):
+                summary = summarizer._get_response(self.summary_prompt(agent_name, pending))
+            self._fold(history_messages, pending, summary)
+        return self._window(history_messages)
+
+    async def async_apply(self, backend, agent_name: str, history_messages: List[Message]) -> List[Message]:
+        pending = self._pending(history_messages, getattr(backend, "model", None))
+        if pending:
+            summarizer = self.summarizer or backend
+            prompt = self.summary_prompt(agent_name, pending)
+            with prompt_history(None):
+                if hasattr(summarizer, "_async_get_response"):
+                    summary = await summarizer._async_get_response(prompt)
+                else:
+                    summary = summarizer._get_response(prompt)
+            self._fold(history_messages, pending, summary)
+        return self._window(history_messages)
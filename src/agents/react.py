@@ -1,13 +1,36 @@
-from typing import List, Optional
+from typing import Callable, List, Optional
 
 from chatarena.backends import (IntelligenceBackend, load_backend,
                                 register_backend)
 from chatarena.config import BackendConfig
 from chatarena.message import SYSTEM_NAME, Message
 
+from ..tokens import prompt_history
+from .context import ContextWindow
+
 REASONING_PROMPT = "Before reponding to the previous message, first think step-by-step about your response. Give only your reasoning, not the response itself."
 
 
+class ReasoningStream:
+    """Receives the reasoning as it streams in, mirroring it into a logged message and passing it to the observers."""
+
+    def __init__(self, message_pool, agent_name: str, observers: List[Callable[[str, str], None]]):
+        self.message_pool = message_pool
+        self.agent_name = agent_name
+        self.observers = observers
+        self.message: Optional[Message] = None
+
+    def __call__(self, text: str):
+        if self.message_pool is not None:
+            if self.message is None:
+                self.message = Message(self.agent_name, text, self.message_pool.last_message.turn, logged=True, visible_to=[])
+                self.message_pool.append_message(self.message)
+            else:
+                self.message.content = text
+        for observer in self.observers:
+            observer(self.agent_name, text)
+
+
 @register_backend
 class ReActWrapper(IntelligenceBackend):
     type_name = 'react'
@@ -19,6 +42,16 @@ class ReActWrapper(IntelligenceBackend):
         backend_config = BackendConfig(**backend_kwargs)
         self._backend = load_backend(backend_config)
         self.message_pool = None
+        # Optional ContextWindow arguments, e.g. {"window": 12, "summarize_every": 4}, to bound the prompt in long games
+        context = kwargs.get('context')
+        self.context = ContextWindow(**context) if context else None
+        # With `stream`, the reasoning is logged and passed to each observer(agent_name, text_so_far) as it arrives
+        self.stream = kwargs.get('stream', False)
+        self.observers: List[Callable[[str, str], None]] = []
+
+    def reset(self):
+        if self.context is not None:
+            self.context.reset()
 
     def get_reasoning(self, query_method, history_messages, request_msg, **kwargs):
         """Returns the reasoning of a query method."""
@@ -26,17 +59,35 @@ class ReActWrapper(IntelligenceBackend):
         reasoning_request_msg = Message(SYSTEM_NAME, REASONING_PROMPT, 0)
         return query_method(history_messages=reasoning_history, request_msg=reasoning_request_msg, **kwargs)
 
+    def reasoning_stream(self, agent_name) -> dict:
+        """Extra query arguments that stream the reasoning, if enabled."""
+        return {"on_stream": ReasoningStream(self.message_pool, agent_name, self.observers)} if self.stream else {}
 
-    def get_action(self, query_method, history_messages, request_msg, agent_name, **kwargs):
-        """Returns the response of a query method."""
-        reasoning = self.get_reasoning(query_method, history_messages=history_messages, request_msg=request_msg, agent_name=agent_name, **kwargs)
-        if self.message_pool:
+    def response_request(self, history_messages, request_msg, agent_name, reasoning, stream: Optional[ReasoningStream] = None):
+        """Logs the reasoning, unless it was already logged while streaming, and returns the history and request message for the response query."""
+        if stream is not None and stream.message is not None:
+            stream.message.content = reasoning
+        elif self.message_pool:
             self.message_pool.append_message(Message(agent_name, reasoning, self.message_pool.last_message.turn, logged=True, visible_to=[]))
         reasoning = f'Thinking to myself: {reasoning} Next, I will respond out loud.'
         reasoning_message = Message(agent_name, reasoning, 0, logged=True, visible_to=[agent_name])
         if not request_msg:
             request_msg = Message(SYSTEM_NAME, f"Now you speak, {agent_name}.", 0)
-        return query_method(history_messages=history_messages + [reasoning_message], request_msg=request_msg, agent_name=agent_name, **kwargs)
+        return history_messages + [reasoning_message], request_msg
+
+    def get_action(self, query_method, history_messages, request_msg, agent_name, **kwargs):
+        """Returns the response of a query method."""
+        stream_kwargs = self.reasoning_stream(agent_name)
+        reasoning = self.get_reasoning(query_method, history_messages=history_messages, request_msg=request_msg, agent_name=agent_name, **stream_kwargs, **kwargs)
+        history_messages, request_msg = self.response_request(history_messages, request_msg, agent_name, reasoning, stream_kwargs.get("on_stream"))
+        return query_method(history_messages=history_messages, request_msg=request_msg, agent_name=agent_name, **kwargs)
+
+    async def async_get_action(self, query_method, history_messages, request_msg, agent_name, **kwargs):
+        """Async version of get_action, for a coroutine query method."""
+        stream_kwargs = self.reasoning_stream(agent_name)
+        reasoning = await self.get_reasoning(query_method, history_messages=history_messages, request_msg=request_msg, agent_name=agent_name, **stream_kwargs, **kwargs)
+        history_messages, request_msg = self.response_request(history_messages, request_msg, agent_name, reasoning, stream_kwargs.get("on_stream"))
+        return await query_method(history_messages=history_messages, request_msg=request_msg, agent_name=agent_name, **kwargs)
 
     def query(
         self,
@@ -48,7 +99,11 @@ class ReActWrapper(IntelligenceBackend):
         *args,
         **kwargs,
     ) -> str:
-        return self.get_action(self._backend.query, agent_name=agent_name, role_desc=role_desc, history_messages=history_messages, global_prompt=global_prompt, request_msg=request_msg, *args, **kwargs)
+        if self.context is not None:
+            history_messages = self.context.apply(self._backend, agent_name, history_messages)
+        # A budget estimates the prompts from the history actually sent
+        with prompt_history(history_messages):
+            return self.get_action(self._backend.query, agent_name=agent_name, role_desc=role_desc, history_messages=history_messages, global_prompt=global_prompt, request_msg=request_msg, *args, **kwargs)
 
     async def async_query(
         self,
@@ -60,4 +115,8 @@ class ReActWrapper(IntelligenceBackend):
         *args,
         **kwargs,
     ) -> str:
-        return self.get_action(self._backend.async_query, agent_name=agent_name, role_desc=role_desc, history_messages=history_messages, global_prompt=global_prompt, request_msg=request_msg, *args, **kwargs)
+        if self.context is not None:
+            history_messages = await self.context.async_apply(self._backend, agent_name, history_messages)
+        # A budget estimates the prompts from the history actually sent
+        with prompt_history(history_messages):
+            return await self.async_get_action(self._backend.async_query, agent_name=agent_name, role_desc=role_desc, history_messages=history_messages, global_prompt=global_prompt, request_msg=request_msg, *args, **kwargs)
@@ -0,0 +1,201 @@
+import random
+import re
+from typing import Callable, Dict, List, Optional
+
+from chatarena.backends import IntelligenceBackend, register_backend
+from chatarena.message import Message
+
+CARD_PATTERN = re.compile(r'([^\[\],]+?) \((?:CHARACTER|EVENT|THING|PLACE|ASPECT)\)( \(Interrupt\))?')
+PLAYER_PATTERN = re.compile(r'Player \d+')
+
+
+def _last_content(history_messages: List[Message], prefix: str) -> Optional[str]:
+    for message in reversed(history_messages):
+        if message.content.startswith(prefix):
+            return message.content
+    return None
+
+
+def _other_players(agent_name: str, history_messages: List[Message]) -> List[str]:
+    names = {message.agent_name for message in history_messages if PLAYER_PATTERN.fullmatch(message.agent_name)}
+    for message in history_messages:
+        names.update(PLAYER_PATTERN.findall(message.content))
+    names.discard(agent_name)
+    return sorted(names) or [agent_name]
+
+
+def once_upon_a_time_strategy(agent_name: str, history_messages: List[Message], rng: random.Random) -> str:
+    hand = _last_content(history_messages, 'Your current_hand is') or ''
+    storyteller = _last_content(history_messages, 'The current storyteller is') or ''
+    cards = CARD_PATTERN.findall(hand)
+    ending = hand.split('Ending: ')[-1]
+    if storyteller.endswith(agent_name):
+        if not cards:
+            return f"At last, everything fell into place. {ending}"
+        return f"Then the story turned to the <b>{cards[0][0].strip()}</b>."
+    roll = rng.random()
+    if roll < 0.1:
+        return "CHALLENGE: That does not fit the story."
+    if roll < 0.2 and cards:
+        return f"INTERRUPTION: It was really the <b>{rng.choice(cards)[0].strip()}</b> all along."
+    return "PASS"
+
+
+def prisoner_strategy(agent_name: str, history_messages: List[Message], rng: random.Random) -> str:
+    return rng.choice(["I will cooperate.", "I will defect."])
+
+
+def public_good_strategy(agent_name: str, history_messages: List[Message], rng: random.Random) -> str:
+    return f"I contribute {rng.randint(0, 10) * 10} points."
+
+
+def social_deduction_strategy(agent_name: str, history_messages: List[Message], rng: random.Random) -> str:
+    last = history_messages[-1].content if history_messages else ''
+    if 'guess the secret code' in last:
+        return 'I guess the code is "Apple"'
+    if last.startswith('Now vote'):
+        return f"I vote for {rng.choice(_other_players(agent_name, history_messages))}."
+    return f"My clue is something {rng.choice(['round', 'common', 'bright', 'small', 'famous'])}."
+
+
+def avalon_strategy(agent_name: str, history_messages: List[Message], rng: random.Random) -> str:
+    last = history_messages[-1].content if history_messages else ''
+    evil = any(message.content.startswith('You are') and 'evil side' in message.content for message in history_messages)
+    others = [player for player in _other_players(agent_name, history_messages) if player != agent_name]
+    team_size = re.search(r'propose a team of (\d+)', last)
+    if team_size:
+        return f"I propose {', '.join([agent_name] + rng.sample(others, int(team_size.group(1)) - 1))}."
+    if 'approve or reject' in last:
+        return "I approve." if rng.random() < 0.7 else "I reject."
+    if 'success or fail' in last:
+        return "I play fail." if evil and rng.random() < 0.7 else "I play success."
+    return f"I name {rng.choice(others)}."
+
+
+def hanabi_strategy(agent_name: str, history_messages: List[Message], rng: random.Random) -> str:
+    moves = (_last_content(history_messages, f'{agent_name}, it is your turn') or '').split('Your legal moves: ')[-1]
+    return rng.choice(moves.rstrip('.').split('; '))
+
+
+def apples_to_apples_strategy(agent_name: str, history_messages: List[Message], rng: random.Random) -> str:
+    last = history_messages[-1].content if history_messages else ''
+    if last.startswith('Your hand: '):
+        return f"I play {rng.choice(last[len('Your hand: '):].rstrip('.').split('; '))}."
+    return f"I pick number {rng.randint(1, len(re.findall(r'^[0-9]+[.] ', last, re.MULTILINE)) or 1)}."
+
+
+def deliberation_strategy(agent_name: str, history_messages: List[Message], rng: random.Random) -> str:
+    options = re.findall(r'(\d+)\. ', history_messages[0].content.split('Options: ')[-1]) if history_messages else ['1']
+    vote = rng.choice(options)
+    if 'make your contribution' in history_messages[-1].content:
+        return f"I think option {vote} serves us best, for the reasons above.\nVOTE: {vote}"
+    return f"VOTE: {vote}"
+
+
+def bohnanza_strategy(agent_name: str, history_messages: List[Message], rng: random.Random) -> str:
+    last = history_messages[-1].content if history_messages else ''
+    if 'plant two' in last:
+        return rng.choice(["I plant one.", "I plant two."])
+    if last.startswith('Your hand: '):
+        hand = last[len('Your hand: '):].rstrip('.').split(', ')
+        turned = next((message.content for message in reversed(history_messages) if 'turns over' in message.content), '')
+        face_up = re.findall(r'\d+ ([a-z-]+)', turned.split('turns over ')[-1].split('. Everyone')[0])
+        if hand != ['empty'] and face_up and rng.random() < 0.5:
+            return f"OFFER: {rng.choice(hand)} for {rng.choice(face_up)}"
+        return "PASS"
+    offers = re.findall(r'(Player \d+): gives', _last_content(history_messages, 'Offers:') or '')
+    accepted = [player for player in offers if rng.random() < 0.5]
+    return f"ACCEPT: {', '.join(accepted) or 'none'}"
+
+
+STRATEGIES: Dict[str, Callable[[str, List[Message], random.Random], str]] = {
+    "once_upon_a_time": once_upon_a_time_strategy,
+    "prisoner": prisoner_strategy,
+    "public_good": public_good_strategy,
+    "chameleon": social_deduction_strategy,
+    "undercover_competition": social_deduction_strategy,
+    "avalon": avalon_strategy,
+    "hanabi": hanabi_strategy,
+    "apples_to_apples": apples_to_apples_strategy,
+    "deliberation": deliberation_strategy,
+    "bohnanza": bohnanza_strategy,
+}
+
+
+@register_backend
+class ScriptedAgent(IntelligenceBackend):
+    """Heuristic player that answers instantly, for measuring engine overhead without an LLM."""
+    type_name = 'scripted'
+    stateful = False
+
+    def __init__(self, game: str, seed: Optional[int] = None, **kwargs):
+        super().__init__(game=game, seed=seed, **kwargs)
+        self.strategy = STRATEGIES[game]
+        self.rng = random.Random(seed)
+
+    def query(
+        self,
+        agent_name: str,
+        role_desc: str,
+        history_messages: List[Message],
+        global_prompt: Optional[str] = None,
+        request_msg: Optional[Message] = None,
+        *args,
+        **kwargs,
+    ) -> str:
+        if request_msg:
+            history_messages = history_messages + [request_msg]
+        return self.strategy(agent_name, history_messages, self.rng)
+
+    async def async_query(self, *args, **kwargs) -> str:
+        return self.query(*args, **kwargs)
+
+
+@register_backend
+class ScriptedParser(IntelligenceBackend):
+    """Stand-in for the Parser's LLM that answers moderation questions with string matching.
+
+    As a player's backend, it answers the request, or else the last history message, as a Parser question.
+    """
+    type_name = 'scripted-parser'
+    stateful = False
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+    def _get_response(self, messages: List[dict]) -> str:
+        prompt = messages[-1]["content"]
+        lower = prompt.lower()
+        lines = prompt.split('\n')
+        # The text being judged is on the line after the question
+        subject = lines[1] if len(lines) > 1 else prompt
+        if 'cooperate or defect' in lower:
+            return 'defect' if 'defect' in subject.lower() else 'cooperate'
+        if 'how many points' in lower:
+            numbers = re.findall(r'\d+(?:\.\d+)?', subject)
+            return numbers[0] if numbers else '0'
+        if 'guess the word' in lower:
+            return 'incorrect'
+        if 'approve or reject' in lower:
+            return 'reject' if 'reject' in subject.lower() else 'approve'
+        if 'success or fail' in lower:
+            return 'fail' if 'fail' in subject.lower() else 'success'
+        if 'name of the player' in lower:
+            return subject
+        return 'yes'
+
+    def query(
+        self,
+        agent_name: str,
+        role_desc: str,
+        history_messages: List[Message],
+        global_prompt: Optional[str] = None,
+        request_msg: Optional[Message] = None,
+        *args,
+        **kwargs,
+    ) -> str:
+        last = request_msg or (history_messages[-1] if history_messages else None)
+        return self._get_response([{"role": "user", "content": last.content if last else ''}])
+
+    async def async_query(self, *args, **kwargs) -> str:
+        return self.query(*args, **kwargs)
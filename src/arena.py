@@ -0,0 +1,170 @@
+import gzip
+import logging
+import os
+import pickle
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+from chatarena import arena
+from chatarena.arena import TooManyInvalidActions
+from chatarena.config import ArenaConfig, Config
+from chatarena.environments import TimeStep
+from chatarena.message import Message
+
+from .agents.react import ReActWrapper
+from .budget import BudgetExhausted, TokenBudget, apply_budget
+from .message_store import MessageStore, apply_message_store
+from .routing import RoutingPolicy, apply_routing
+
+PARSER_BACKEND = {"backend_type": "openai-chat", "temperature": 0.0}
+
+# Players acting in the same simultaneous phase, e.g. an Avalon team vote, answer on these threads
+_executor = ThreadPoolExecutor(max_workers=32)
+
+
+def use_base_url(backend_config: Config, base_url: str) -> None:
+    """Points every `openai-chat` backend in a (possibly wrapped) backend config at `base_url`."""
+    if backend_config.get("backend_type") == "openai-chat":
+        backend_config["base_url"] = base_url
+    for key in ("backend", "fallback"):
+        if key in backend_config:
+            use_base_url(backend_config[key], base_url)
+
+
+def log_react_agent_reasoning(arena: 'Arena') -> None:
+    message_pool = arena.environment.message_pool
+    for player in arena.players:
+        if isinstance(player.backend, ReActWrapper):
+            player.backend.message_pool = message_pool
+
+
+def message_rows(messages: List[Message]) -> List[Dict[str, Any]]:
+    """The json rows written by `Arena.save_history`."""
+    return [
+        {
+            "agent_name": message.agent_name,
+            "content": message.content,
+            "turn": message.turn,
+            "timestamp": str(message.timestamp),
+            "visible_to": message.visible_to,
+            "msg_type": message.msg_type,
+        }
+        for message in messages
+    ]
+
+
+class Arena(arena.Arena):
+    """chatarena's Arena, plus the repo-level config options below.
+
+    openai_base_url: send every `openai-chat` call, including the Parser's, to an OpenAI-compatible
+        endpoint such as `python -m src.stand_in_server`.
+    routing: `RoutingPolicy` arguments, choosing the model and `max_tokens` per phase and call.
+    budget: `TokenBudget` arguments, e.g. {"total_tokens": 200000, "per_agent_tokens": 60000}. Players answer
+        more briefly from a shorter history as it runs down, and the game ends, with no winner, once it is spent.
+    message_store: `MessageStore` arguments, e.g. {"max_live": 500, "horizon": 10}, interning repeated messages and
+        spilling those no player can observe any more to disk, so long games and busy hosts keep their memory flat.
+
+    Environments with simultaneous phases list everyone who may act in `get_next_players()`; a step then asks
+    them all at once and applies their actions in that order. It also counts the steps taken, and `run` can checkpoint the game so a crashed run resumes with `load_checkpoint`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.steps_taken = 0
+
+    def reset(self):
+        self.steps_taken = 0
+        if getattr(self, "budget", None) is not None:
+            self.budget.reset()
+        return super().reset()
+
+    def simultaneous_players(self) -> List[str]:
+        """The players who act together in the next step, if the environment is in a simultaneous phase."""
+        get_next_players = getattr(self.environment, "get_next_players", None)
+        players = get_next_players() if get_next_players else []
+        return players if len(players) > 1 else []
+
+    def valid_action(self, player_name: str, observation: List[Message]) -> str:
+        """The player's action, asked again up to `invalid_actions_retry` times while the environment rejects it."""
+        player = self.name_to_player[player_name]
+        for _ in range(self.invalid_actions_retry):
+            action = player(observation)
+            if self.environment.check_action(action, player_name):
+                return action
+            logging.warning(f"{player_name} made an invalid action {action}")
+        raise TooManyInvalidActions(f"{player_name} has made invalid actions for {self.invalid_actions_retry} times. Terminating the game.")
+
+    def simultaneous_step(self, player_names: List[str]) -> TimeStep:
+        # Every observation is taken before anyone acts, so nobody sees another's action
+        observations = [self.environment.get_observation(player_name) for player_name in player_names]
+        actions = list(_executor.map(self.valid_action, player_names, observations))
+        for player_name, action in zip(player_names, actions):
+            timestep = self.environment.step(player_name, action)
+        return timestep
+
+    def step(self):
+        try:
+            player_names = self.simultaneous_players()
+            self.current_timestep = self.simultaneous_step(player_names) if player_names else super().step()
+        except BudgetExhausted as e:
+            self.current_timestep = self.end_game(str(e))
+        self.steps_taken += 1
+        return self.current_timestep
+
+    def end_game(self, reason: str) -> TimeStep:
+        """Ends the game early: the moderator announces why and nobody is rewarded."""
+        logging.info(reason)
+        announcement = f"The game is over. {reason}"
+        if hasattr(self.environment, "_moderator_speak"):
+            self.environment._moderator_speak(announcement)
+        else:
+            message_pool = self.environment.message_pool
+            message_pool.append_message(Message("Moderator", announcement, message_pool.last_turn + 1))
+        return TimeStep(observation=self.environment.get_observation(),
+                        reward={player.name: 0 for player in self.players}, terminal=True)
+
+    def run(self, num_steps: int = 1, checkpoint: Optional[str] = None, checkpoint_every: int = 1):
+        """Run the game for num_steps, saving a checkpoint every `checkpoint_every` steps and at the end."""
+        for i in range(num_steps):
+            timestep = self.step()
+            if checkpoint and (timestep.terminal or (i + 1) % checkpoint_every == 0 or i + 1 == num_steps):
+                self.save_checkpoint(checkpoint)
+            if timestep.terminal:
+                break
+
+    def save_checkpoint(self, path: str):
+        """Pickles the environment, players and RNG state, writing atomically so a crash never leaves half a file."""
+        state = {"arena": self, "random": random.getstate(), "numpy_random": np.random.get_state()}
+        with gzip.open(f"{path}.tmp", "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{path}.tmp", path)
+
+    @staticmethod
+    def load_checkpoint(path: str) -> 'Arena':
+        with gzip.open(path, "rb") as f:
+            state = pickle.load(f)
+        random.setstate(state["random"])
+        np.random.set_state(state["numpy_random"])
+        return state["arena"]
+
+    @classmethod
+    def from_config(cls, config: Union[str, ArenaConfig]):
+        if isinstance(config, str):
+            config = ArenaConfig.load(config)
+        base_url = config.get("openai_base_url")
+        if base_url:
+            for player_config in config.players:
+                use_base_url(player_config.backend, base_url)
+            parser_config = config.environment.setdefault("parser", Config())
+            parser_config.setdefault("backend", Config(PARSER_BACKEND))
+            use_base_url(parser_config["backend"], base_url)
+        arena = super().from_config(config)
+        if config.get("routing"):
+            apply_routing(arena, RoutingPolicy(**config["routing"]))
+        if config.get("budget"):
+            apply_budget(arena, TokenBudget(**config["budget"]))
+        if config.get("message_store"):
+            apply_message_store(arena, MessageStore(**config["message_store"]))
+        return arena
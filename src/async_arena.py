@@ -0,0 +1,154 @@
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from chatarena.agent import SIGNAL_END_OF_CONVERSATION, Player
+from chatarena.arena import TooManyInvalidActions
+from chatarena.environments import TimeStep
+from tenacity import RetryError
+
+from .arena import Arena, log_react_agent_reasoning, message_rows
+from .budget import BudgetExhausted
+from .instrumentation import instrument
+from .ratings import player_info
+from .results import ResultsStore
+
+
+async def async_act(player: Player, observation, semaphore: asyncio.Semaphore) -> str:
+    """`Player.act` on the event loop; backends without a real `async_query` run on a thread."""
+    kwargs = dict(agent_name=player.name, role_desc=player.role_desc, history_messages=observation,
+                  global_prompt=player.global_prompt, request_msg=None)
+    async with semaphore:
+        try:
+            try:
+                return await player.backend.async_query(**kwargs)
+            except NotImplementedError:
+                return await asyncio.to_thread(player.backend.query, **kwargs)
+        except RetryError as e:
+            err_msg = f"Agent {player.name} failed to generate a response. Error: {e.last_attempt.exception()}. Sending signal to end the conversation."
+            logging.warning(err_msg)
+            return SIGNAL_END_OF_CONVERSATION + err_msg
+
+
+async def async_valid_action(arena: Arena, player_name: str, observation, semaphore: asyncio.Semaphore) -> str:
+    player = arena.name_to_player[player_name]
+    for _ in range(arena.invalid_actions_retry):
+        action = await async_act(player, observation, semaphore)
+        if arena.environment.check_action(action, player_name):
+            return action
+        logging.warning(f"{player_name} made an invalid action {action}")
+    raise TooManyInvalidActions(f"{player_name} has made invalid actions for {arena.invalid_actions_retry} times. Terminating the game.")
+
+
+def step_all(environment, player_names: List[str], actions: List[str]) -> TimeStep:
+    for player_name, action in zip(player_names, actions):
+        timestep = environment.step(player_name, action)
+    return timestep
+
+
+async def async_step(arena: Arena, semaphore: asyncio.Semaphore) -> TimeStep:
+    """`Arena.step`, yielding to other games while the player or the Parser waits on the network.
+
+    In a simultaneous phase every player who may act is asked at once.
+    """
+    environment = arena.environment
+    player_names = arena.simultaneous_players() or [environment.get_next_player()]
+    observations = [environment.get_observation(player_name) for player_name in player_names]
+    try:
+        actions = await asyncio.gather(*(async_valid_action(arena, player_name, observation, semaphore)
+                                         for player_name, observation in zip(player_names, observations)))
+    except BudgetExhausted as e:
+        return arena.end_game(str(e))
+    # Environments call the Parser synchronously, so the step runs on a thread and holds a request slot
+    async with semaphore:
+        return await asyncio.to_thread(step_all, environment, player_names, actions)
+
+
+async def play_game(config_path: str, seed: int, num_steps: int, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    start = time.perf_counter()
+    steps, timestep, error, history, metrics, players = 0, None, None, [], None, None
+    try:
+        # Seeding just before the arena is built keeps the initial deal reproducible; later steps interleave with other games
+        random.seed(seed)
+        arena = Arena.from_config(config_path)
+        log_react_agent_reasoning(arena)
+        instrumentation = instrument(arena)
+        timestep = arena.current_timestep
+        while steps < num_steps and not timestep.terminal:
+            timestep = await async_step(arena, semaphore)
+            steps += 1
+        history = message_rows(arena.environment.get_observation())
+        metrics = instrumentation.summary()
+        players = player_info(arena)
+        if getattr(arena, "budget", None) is not None:
+            metrics["budget"] = arena.budget.summary()
+    except Exception:
+        error = traceback.format_exc()
+    return {
+        "config": config_path,
+        "seed": seed,
+        "steps": steps,
+        "terminal": bool(timestep and timestep.terminal),
+        "duration": time.perf_counter() - start,
+        "rewards": dict(timestep.reward) if timestep and not error else None,
+        "history": history,
+        "error": error,
+        "metrics": metrics,
+        "players": players,
+    }
+
+
+async def run_games(config_paths: List[str], num_games: int, num_steps: int, results_path: str,
+                    concurrency: int = 64, max_active_games: int = 256, seed: int = 0) -> Dict[str, Any]:
+    """Interleaves every game on one event loop.
+
+    At most `concurrency` requests are in flight at once. Each game has at most one outstanding request and
+    the semaphore wakes waiters in FIFO order, so games take turns fairly. At most `max_active_games` games
+    are held in memory at a time.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    # Size the thread pool for environment steps and sync-only backends to the request limit
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(concurrency))
+    queue: asyncio.Queue = asyncio.Queue()
+    for config_path in config_paths:
+        for game in range(num_games):
+            queue.put_nowait((config_path, seed + game))
+    store = ResultsStore(results_path)
+    total = queue.qsize()
+
+    async def game_slot():
+        while not queue.empty():
+            config_path, game_seed = queue.get_nowait()
+            result = await play_game(config_path, game_seed, num_steps, semaphore)
+            store.add_game(**result)
+            if result["error"]:
+                logging.warning(f"Game {config_path} (seed {game_seed}) failed:\n{result['error']}")
+            logging.info(f"{total - queue.qsize()}/{total} games started, {config_path} seed {game_seed} done")
+
+    await asyncio.gather(*(game_slot() for _ in range(min(max_active_games, total))))
+    summary = {"win_rates": store.win_rates(), "ratings": store.ratings().leaderboard()}
+    store.close()
+    return summary
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description="Play many games concurrently on a single event loop.")
+    argparser.add_argument("configs", nargs="+", help="arena config files, e.g. game_configs/prisoner.json")
+    argparser.add_argument("--games", type=int, default=10, help="games per config")
+    argparser.add_argument("--steps", type=int, default=40, help="maximum steps per game")
+    argparser.add_argument("--concurrency", type=int, default=64, help="maximum requests in flight")
+    argparser.add_argument("--max-active-games", type=int, default=256)
+    argparser.add_argument("--seed", type=int, default=0)
+    argparser.add_argument("--results", default="results.db", help="sqlite results store, appended to across batches")
+    args = argparser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    summary = asyncio.run(run_games(args.configs, args.games, args.steps, args.results,
+                                    args.concurrency, args.max_active_games, args.seed))
+    print(json.dumps(summary, indent=4))
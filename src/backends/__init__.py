@@ -0,0 +1,2 @@
+from .openai import OpenAIChat
+from .classifier import ZeroShotClassifier
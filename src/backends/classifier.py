@@ -0,0 +1,79 @@
+import importlib.util
+import threading
+from typing import Dict, List, Optional, Union
+
+from chatarena.backends import IntelligenceBackend, load_backend, register_backend
+from chatarena.config import BackendConfig
+
+from .openai import OpenAIChat
+
+DEFAULT_HYPOTHESIS = "This example is {}."
+
+# One pipeline per model, shared by every classifier in the process
+_pipelines: Dict[str, "transformers.Pipeline"] = {}
+_pipeline_lock = threading.Lock()
+
+
+def zero_shot_pipeline(model: str):
+    if model not in _pipelines:
+        # Imported here, as transformers takes seconds to import and only Parser judgments need it
+        from transformers import pipeline
+        _pipelines[model] = pipeline("zero-shot-classification", model=model, device=-1)
+    return _pipelines[model]
+
+
+@register_backend
+class ZeroShotClassifier(IntelligenceBackend):
+    """Parser backend that answers multiple-choice judgments with a local NLI model on CPU.
+
+    A judgment whose best choice scores below `threshold` is answered by the `fallback` backend
+    instead, as is every free-form prompt. As a player's backend, it queries the fallback.
+    """
+    type_name = 'zero-shot-classifier'
+    stateful = False
+
+    def __init__(self, model: str = "typeform/distilbert-base-uncased-mnli", threshold: float = 0.8,
+                 fallback: Optional[dict] = None, **kwargs):
+        assert importlib.util.find_spec("transformers") is not None, "transformers package is not installed"
+        super().__init__(model=model, threshold=threshold, fallback=fallback, **kwargs)
+        self.model = model
+        self.threshold = threshold
+        self.fallback = load_backend(BackendConfig(**fallback)) if fallback else OpenAIChat(temperature=0.0)
+        self.classified = 0
+        self.fell_back = 0
+
+    @property
+    def attempts(self) -> int:
+        return getattr(self.fallback, "attempts", 0)
+
+    @property
+    def last_usage(self):
+        return getattr(self.fallback, "last_usage", None)
+
+    def classify(self, text: str, choices: Union[List[str], Dict[str, str]], hypothesis: Optional[str] = None) -> Optional[str]:
+        """The best of `choices` for `text`, or None when the model is not confident enough.
+
+        `choices` may map each candidate label to the answer to return for it.
+        """
+        # Games stepping on other threads share the pipeline, which is not safe to call concurrently
+        with _pipeline_lock:
+            result = zero_shot_pipeline(self.model)(text, candidate_labels=list(choices),
+                                                    hypothesis_template=hypothesis or DEFAULT_HYPOTHESIS)
+        if result["scores"][0] < self.threshold:
+            self.fell_back += 1
+            return None
+        self.classified += 1
+        label = result["labels"][0]
+        return choices[label] if isinstance(choices, dict) else label
+
+    def _get_response(self, messages):
+        return self.fallback._get_response(messages)
+
+    async def _async_get_response(self, messages):
+        return await self.fallback._async_get_response(messages)
+
+    def query(self, *args, **kwargs) -> str:
+        return self.fallback.query(*args, **kwargs)
+
+    async def async_query(self, *args, **kwargs) -> str:
+        return await self.fallback.async_query(*args, **kwargs)
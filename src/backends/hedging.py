@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures import wait
+from typing import Any, Callable, Dict
+
+# Runs the sync requests of every hedged backend; a losing request keeps its thread until it returns
+_executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="hedge")
+
+
+class Hedger:
+    """Sends a duplicate request when the first one is slower than the `percentile` of recent latencies.
+
+    The first answer wins. A losing async request is cancelled; a losing sync request cannot be
+    interrupted, so its answer is dropped. At most `max_rate` of the last `window` requests are hedged.
+    Until `min_samples` latencies are known, the hedge delay is `initial_delay` seconds.
+    """
+
+    def __init__(self, percentile: float = 0.95, initial_delay: float = 2.0, min_delay: float = 0.05,
+                 max_rate: float = 0.1, window: int = 200, min_samples: int = 20):
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_rate = max_rate
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._hedged = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def reset_stats(self):
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"requests": self.requests, "hedges": self.hedges, "hedge_wins": self.hedge_wins, "delay": self.delay()}
+
+    def delay(self) -> float:
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.initial_delay
+            latencies = sorted(self._latencies)
+        return max(self.min_delay, latencies[min(len(latencies) - 1, int(self.percentile * len(latencies)))])
+
+    def _allow_hedge(self) -> bool:
+        with self._lock:
+            return sum(self._hedged) + 1 <= self.max_rate * (len(self._hedged) + 1)
+
+    def _record(self, latency: float, hedged: bool, hedge_won: bool):
+        with self._lock:
+            self._latencies.append(latency)
+            self._hedged.append(hedged)
+            self.requests += 1
+            self.hedges += hedged
+            self.hedge_wins += hedge_won
+
+    def call(self, function: Callable, *args) -> Any:
+        start = time.perf_counter()
+        primary = _executor.submit(function, *args)
+        try:
+            result = primary.result(timeout=self.delay())
+        except FutureTimeout:
+            pass
+        else:
+            self._record(time.perf_counter() - start, False, False)
+            return result
+        if not self._allow_hedge():
+            result = primary.result()
+            self._record(time.perf_counter() - start, False, False)
+            return result
+        hedge_start = time.perf_counter()
+        hedge = _executor.submit(function, *args)
+        pending = {primary, hedge}
+        while True:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None or not pending:
+                    hedge_won = future is hedge
+                    self._record(time.perf_counter() - (hedge_start if hedge_won else start), True, hedge_won)
+                    for loser in pending:
+                        loser.cancel()
+                    return future.result()
+
+    async def async_call(self, function: Callable, *args) -> Any:
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(function(*args))
+        done, _ = await asyncio.wait({primary}, timeout=self.delay())
+        if done or not self._allow_hedge():
+            result = await primary
+            self._record(time.perf_counter() - start, False, False)
+            return result
+        hedge_start = time.perf_counter()
+        hedge = asyncio.ensure_future(function(*args))
+        pending = {primary, hedge}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None or not pending:
+                        hedge_won = task is hedge
+                        self._record(time.perf_counter() - (hedge_start if hedge_won else start), True, hedge_won)
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,238 @@
+import os
+import re
+from typing import Callable, Dict, List, Optional
+
+from chatarena.backends import IntelligenceBackend, register_backend
+from chatarena.backends import openai as openai_backend
+from chatarena.backends.openai import BASE_PROMPT, END_OF_MESSAGE, STOP
+from chatarena.message import SYSTEM_NAME, Message
+from tenacity import retry, stop_after_attempt, wait_random_exponential
+
+from .hedging import Hedger
+
+try:
+    import openai
+except ImportError:
+    openai = None
+
+# One client per endpoint, shared by every backend so hundreds of games reuse one connection pool
+_clients: Dict[str, "openai.OpenAI"] = {}
+_async_clients: Dict[Optional[str], "openai.AsyncOpenAI"] = {}
+
+
+def _api_key(base_url: Optional[str]) -> Optional[str]:
+    # A local endpoint needs no real API key
+    return os.environ.get("OPENAI_API_KEY") or ("stand-in" if base_url else None)
+
+
+def client(base_url: str) -> "openai.OpenAI":
+    if base_url not in _clients:
+        _clients[base_url] = openai.OpenAI(base_url=base_url, api_key=_api_key(base_url))
+    return _clients[base_url]
+
+
+def async_client(base_url: Optional[str] = None) -> "openai.AsyncOpenAI":
+    if base_url not in _async_clients:
+        _async_clients[base_url] = openai.AsyncOpenAI(base_url=base_url, api_key=_api_key(base_url))
+    return _async_clients[base_url]
+
+
+@register_backend
+class OpenAIChat(openai_backend.OpenAIChat):
+    """`openai-chat` that can also target any OpenAI-compatible endpoint, such as the stand-in server, via `base_url`.
+
+    `hedge` takes Hedger arguments, e.g. {"percentile": 0.95, "max_rate": 0.1}, to cut tail latency with duplicate requests.
+    A completion given an `on_stream` callback is streamed instead, calling it with the text received so far;
+    streamed completions are not hedged.
+    """
+    type_name = 'openai-chat'
+
+    def __init__(
+        self,
+        temperature: float = openai_backend.DEFAULT_TEMPERATURE,
+        max_tokens: int = openai_backend.DEFAULT_MAX_TOKENS,
+        model: str = openai_backend.DEFAULT_MODEL,
+        merge_other_agents_as_one_user: bool = True,
+        base_url: Optional[str] = None,
+        hedge: Optional[dict] = None,
+        **kwargs,
+    ):
+        self.base_url = base_url
+        self.hedger = Hedger(**hedge) if hedge else None
+        # Attempts made and token usage of the latest completion, read by the instrumentation
+        self.attempts = 0
+        self.last_usage = None
+        if base_url is None:
+            super().__init__(temperature=temperature, max_tokens=max_tokens, model=model,
+                             merge_other_agents_as_one_user=merge_other_agents_as_one_user, hedge=hedge, **kwargs)
+            self.client = getattr(openai_backend, 'client', None)
+            return
+        # Skip the upstream check, which requires an API key
+        assert openai is not None, "openai package is not installed"
+        IntelligenceBackend.__init__(self, temperature=temperature, max_tokens=max_tokens, model=model,
+                                     merge_other_agents_as_one_user=merge_other_agents_as_one_user, base_url=base_url,
+                                     hedge=hedge, **kwargs)
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.model = model
+        self.merge_other_agent_as_user = merge_other_agents_as_one_user
+        self.client = client(base_url)
+
+    def __getstate__(self):
+        # HTTP clients are shared per process and rebuilt on unpickling, e.g. when resuming a checkpoint
+        state = self.__dict__.copy()
+        state.pop('client', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.client = client(self.base_url) if self.base_url else getattr(openai_backend, 'client', None)
+
+    def _complete(self, messages):
+        completion = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            stop=STOP,
+        )
+        return completion.choices[0].message.content.strip(), completion.usage
+
+    async def _async_complete(self, messages):
+        completion = await async_client(self.base_url).chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            stop=STOP,
+        )
+        return completion.choices[0].message.content.strip(), completion.usage
+
+    def _stream(self, messages, on_stream: Callable[[str], None]):
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            stop=STOP,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        text, usage = "", None
+        for chunk in stream:
+            usage = chunk.usage or usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                text += chunk.choices[0].delta.content
+                on_stream(text)
+        return text.strip(), usage
+
+    async def _async_stream(self, messages, on_stream: Callable[[str], None]):
+        stream = await async_client(self.base_url).chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            stop=STOP,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        text, usage = "", None
+        async for chunk in stream:
+            usage = chunk.usage or usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                text += chunk.choices[0].delta.content
+                on_stream(text)
+        return text.strip(), usage
+
+    @retry(stop=stop_after_attempt(6), wait=wait_random_exponential(min=1, max=60))
+    def _get_response(self, messages, on_stream: Optional[Callable[[str], None]] = None):
+        self.attempts += 1
+        if on_stream is not None:
+            response, self.last_usage = self._stream(messages, on_stream)
+        elif self.hedger is None:
+            response, self.last_usage = self._complete(messages)
+        else:
+            response, self.last_usage = self.hedger.call(self._complete, messages)
+        return response
+
+    @retry(stop=stop_after_attempt(6), wait=wait_random_exponential(min=1, max=60))
+    async def _async_get_response(self, messages, on_stream: Optional[Callable[[str], None]] = None):
+        self.attempts += 1
+        if on_stream is not None:
+            response, self.last_usage = await self._async_stream(messages, on_stream)
+        elif self.hedger is None:
+            response, self.last_usage = await self._async_complete(messages)
+        else:
+            response, self.last_usage = await self.hedger.async_call(self._async_complete, messages)
+        return response
+
+    def _format_messages(
+        self,
+        agent_name: str,
+        role_desc: str,
+        history_messages: List[Message],
+        global_prompt: Optional[str] = None,
+        request_msg: Optional[Message] = None,
+    ) -> List[Dict[str, str]]:
+        """The chat-completions messages upstream `query` sends, factored out so `async_query` sends the same."""
+        if global_prompt:
+            system_prompt = f"You are a helpful assistant.\n{global_prompt.strip()}\n{BASE_PROMPT}\n\nYour name is {agent_name}.\n\nYour role:{role_desc}"
+        else:
+            system_prompt = f"You are a helpful assistant. Your name is {agent_name}.\n\nYour role:{role_desc}\n\n{BASE_PROMPT}"
+
+        all_messages = [(SYSTEM_NAME, system_prompt)]
+        for msg in history_messages:
+            if msg.agent_name == SYSTEM_NAME:
+                all_messages.append((SYSTEM_NAME, msg.content))
+            else:
+                all_messages.append((msg.agent_name, f"{msg.content}{END_OF_MESSAGE}"))
+        if request_msg:
+            all_messages.append((SYSTEM_NAME, request_msg.content))
+        else:
+            all_messages.append((SYSTEM_NAME, f"Now you speak, {agent_name}.{END_OF_MESSAGE}"))
+
+        messages = [{"role": "system", "content": system_prompt}]
+        for name, content in all_messages[1:]:
+            if name == agent_name:
+                messages.append({"role": "assistant", "content": content})
+            elif messages[-1]["role"] == "user":
+                if self.merge_other_agent_as_user:
+                    messages[-1]["content"] = f"{messages[-1]['content']}\n\n[{name}]: {content}"
+                else:
+                    messages.append({"role": "user", "content": f"[{name}]: {content}"})
+            elif messages[-1]["role"] == "assistant":
+                messages[-1]["content"] = f"{messages[-1]['content']}\n{content}"
+            else:
+                messages.append({"role": "user", "content": f"[{name}]: {content}"})
+        return messages
+
+    def _clean_response(self, response: str, agent_name: str) -> str:
+        response = re.sub(r"^\s*\[.*]:", "", response).strip()
+        response = re.sub(rf"^\s*{re.escape(agent_name)}\s*:", "", response).strip()
+        return re.sub(rf"{END_OF_MESSAGE}$", "", response).strip()
+
+    def query(
+        self,
+        agent_name: str,
+        role_desc: str,
+        history_messages: List[Message],
+        global_prompt: Optional[str] = None,
+        request_msg: Optional[Message] = None,
+        *args,
+        **kwargs,
+    ) -> str:
+        messages = self._format_messages(agent_name, role_desc, history_messages, global_prompt, request_msg)
+        return self._clean_response(self._get_response(messages, *args, **kwargs), agent_name)
+
+    async def async_query(
+        self,
+        agent_name: str,
+        role_desc: str,
+        history_messages: List[Message],
+        global_prompt: Optional[str] = None,
+        request_msg: Optional[Message] = None,
+        *args,
+        **kwargs,
+    ) -> str:
+        messages = self._format_messages(agent_name, role_desc, history_messages, global_prompt, request_msg)
+        return self._clean_response(await self._async_get_response(messages, *args, **kwargs), agent_name)
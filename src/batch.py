@@ -0,0 +1,101 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import random
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List
+
+import numpy as np
+
+from .arena import Arena, log_react_agent_reasoning, message_rows
+from .instrumentation import instrument
+from .ratings import player_info
+from .results import ResultsStore
+
+# Arenas built by this worker process, keyed by config path, so backends are created once per worker
+_arenas: Dict[str, Arena] = {}
+
+
+def worker_arena(config_path: str) -> Arena:
+    arena = _arenas.get(config_path)
+    if arena is None:
+        arena = _arenas[config_path] = Arena.from_config(config_path)
+        log_react_agent_reasoning(arena)
+        instrument(arena)
+    return arena
+
+
+def play_game(config_path: str, seed: int, num_steps: int) -> Dict[str, Any]:
+    """Plays one game in the worker and returns everything the results store needs."""
+    start = time.perf_counter()
+    steps, timestep, error, metrics, players = 0, None, None, None, None
+    try:
+        arena = worker_arena(config_path)
+        random.seed(seed)
+        np.random.seed(seed)
+        timestep = arena.reset()
+        arena.instrumentation.reset()
+        while steps < num_steps and not timestep.terminal:
+            timestep = arena.step()
+            steps += 1
+        history = message_rows(arena.environment.get_observation())
+        metrics = arena.instrumentation.summary()
+        players = player_info(arena)
+        if getattr(arena, "budget", None) is not None:
+            metrics["budget"] = arena.budget.summary()
+    except Exception:
+        error = traceback.format_exc()
+        history = []
+        _arenas.pop(config_path, None)  # do not reuse an arena left in a broken state
+    return {
+        "config": config_path,
+        "seed": seed,
+        "steps": steps,
+        "terminal": bool(timestep and timestep.terminal),
+        "duration": time.perf_counter() - start,
+        "rewards": dict(timestep.reward) if timestep and not error else None,
+        "history": history,
+        "error": error,
+        "metrics": metrics,
+        "players": players,
+    }
+
+
+def run_batch(config_paths: List[str], num_games: int, num_steps: int, results_path: str,
+              workers: int = 4, seed: int = 0) -> Dict[str, Any]:
+    """Plays `num_games` of every config on a process pool and stores each game as it finishes."""
+    store = ResultsStore(results_path)
+    # spawn, so that no worker inherits the parent's HTTP clients
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [
+            pool.submit(play_game, config_path, seed + game, num_steps)
+            for config_path in config_paths
+            for game in range(num_games)
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            store.add_game(**result)
+            if result["error"]:
+                logging.warning(f"Game {result['config']} (seed {result['seed']}) failed:\n{result['error']}")
+            logging.info(f"{done}/{len(futures)} games done")
+    summary = {"win_rates": store.win_rates(), "ratings": store.ratings().leaderboard()}
+    store.close()
+    return summary
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description="Play many games per config on a process pool.")
+    argparser.add_argument("configs", nargs="+", help="arena config files, e.g. game_configs/prisoner.json")
+    argparser.add_argument("--games", type=int, default=10, help="games per config")
+    argparser.add_argument("--steps", type=int, default=40, help="maximum steps per game")
+    argparser.add_argument("--workers", type=int, default=4)
+    argparser.add_argument("--seed", type=int, default=0)
+    argparser.add_argument("--results", default="results.db", help="sqlite results store, appended to across batches")
+    args = argparser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    summary = run_batch(args.configs, args.games, args.steps, args.results, args.workers, args.seed)
+    print(json.dumps(summary, indent=4))
@@ -0,0 +1,195 @@
+import inspect
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from chatarena.message import SYSTEM_NAME, Message
+
+from .agents.react import ReActWrapper
+from .tokens import count_tokens, current_prompt_history, history_tokens, prompt_history
+
+PARSER_NAME = "Parser"
+
+
+class BudgetExhausted(Exception):
+    pass
+
+
+def estimate_tokens(messages: List[dict], response: str = "", model: Optional[str] = None,
+                    history: Optional[List[Message]] = None) -> Dict[str, int]:
+    """Usage for backends that do not report it.
+
+    Given the `history` the prompt was built from, its messages' cached counts stand in for the prompt, and
+    only the system and role prompt, rebuilt on every call, is tokenized again.
+    """
+    if history is None:
+        prompt_tokens = sum(count_tokens(message.get("content") or "", model) for message in messages)
+    else:
+        system = [message.get("content") or "" for message in messages[:1] if message.get("role") == "system"]
+        prompt_tokens = history_tokens(history, model) + sum(count_tokens(text, model) for text in system)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": count_tokens(response or "", model)}
+
+
+class TokenBudget:
+    """Cumulative prompt and completion tokens of one game, in total and per agent.
+
+    Once less than `shrink_below` of a budget is left, players get proportionally fewer `max_tokens`
+    (down to `min_max_tokens`) and a shorter history (down to `min_history` messages). The opening moderator
+    messages, with the rules and roles, are always kept, and the rest is cut at a start that only moves in
+    steps of `history_step` messages, so the prompt stays the same from turn to turn. When the game
+    or an agent's budget is spent, that player's next turn raises BudgetExhausted and the arena ends the game.
+    """
+
+    def __init__(self, total_tokens: int, per_agent_tokens: Optional[int] = None, shrink_below: float = 0.5,
+                 min_max_tokens: int = 32, min_history: int = 4, history_step: int = 8):
+        self.total_tokens = total_tokens
+        self.per_agent_tokens = per_agent_tokens
+        self.shrink_below = shrink_below
+        self.min_max_tokens = min_max_tokens
+        self.min_history = min_history
+        self.history_step = history_step
+        self.reset()
+
+    def reset(self):
+        self.prompt_tokens: Dict[str, int] = defaultdict(int)
+        self.completion_tokens: Dict[str, int] = defaultdict(int)
+
+    @property
+    def spent(self) -> int:
+        return sum(self.prompt_tokens.values()) + sum(self.completion_tokens.values())
+
+    def spent_by(self, agent: str) -> int:
+        return self.prompt_tokens[agent] + self.completion_tokens[agent]
+
+    def remaining(self, agent: str) -> int:
+        remaining = self.total_tokens - self.spent
+        if self.per_agent_tokens is not None and agent != PARSER_NAME:
+            remaining = min(remaining, self.per_agent_tokens - self.spent_by(agent))
+        return remaining
+
+    def remaining_fraction(self, agent: str) -> float:
+        fraction = 1 - self.spent / self.total_tokens
+        if self.per_agent_tokens is not None and agent != PARSER_NAME:
+            fraction = min(fraction, 1 - self.spent_by(agent) / self.per_agent_tokens)
+        return max(fraction, 0.0)
+
+    def scale(self, agent: str) -> float:
+        return min(1.0, self.remaining_fraction(agent) / self.shrink_below)
+
+    def max_tokens(self, agent: str, configured: int) -> int:
+        return max(self.min_max_tokens, min(int(configured * self.scale(agent)), self.remaining(agent)))
+
+    def history_limit(self, agent: str, history_length: int) -> int:
+        return max(self.min_history, int(history_length * self.scale(agent)))
+
+    def trim_history(self, agent: str, history_messages: List[Message]) -> List[Message]:
+        limit = self.history_limit(agent, len(history_messages))
+        if limit >= len(history_messages):
+            return history_messages
+        opening = 0
+        while opening < limit // 2 and history_messages[opening].agent_name in ("Moderator", SYSTEM_NAME):
+            opening += 1
+        start = len(history_messages) - (limit - opening)
+        start = max(opening, start - start % self.history_step)
+        return history_messages[:opening] + history_messages[start:]
+
+    def spend(self, agent: str, prompt_tokens: int, completion_tokens: int):
+        self.prompt_tokens[agent] += prompt_tokens
+        self.completion_tokens[agent] += completion_tokens
+
+    def check(self, agent: str):
+        if self.remaining(agent) <= 0:
+            raise BudgetExhausted(f"The token budget is exhausted ({self.spent} tokens spent, {self.spent_by(agent)} by {agent}).")
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        agents = set(self.prompt_tokens) | set(self.completion_tokens)
+        return {agent: {"prompt_tokens": self.prompt_tokens[agent], "completion_tokens": self.completion_tokens[agent]} for agent in agents}
+
+
+class BudgetedCompletion:
+    """Replaces a backend's completion method: sets its `max_tokens` from the budget and charges the usage."""
+
+    def __init__(self, budget: TokenBudget, backend, function, agent: str, adapt: bool = True):
+        self.budget = budget
+        self.backend = backend
+        self.function = function
+        self.agent = agent
+        self.configured_max_tokens = getattr(backend, "max_tokens", None) if adapt else None
+
+    def _before(self):
+        if self.configured_max_tokens is not None:
+            self.backend.max_tokens = self.budget.max_tokens(self.agent, self.configured_max_tokens)
+        return getattr(self.backend, "last_usage", None)
+
+    def _charge(self, messages, response, usage_before):
+        usage = getattr(self.backend, "last_usage", None)
+        if usage is not None and usage is not usage_before:
+            self.budget.spend(self.agent, usage.prompt_tokens, usage.completion_tokens)
+        else:
+            self.budget.spend(self.agent, **estimate_tokens(messages, response, getattr(self.backend, "model", None),
+                                                            current_prompt_history()))
+
+    def __call__(self, messages, *args, **kwargs):
+        usage_before = self._before()
+        response = self.function(messages, *args, **kwargs)
+        self._charge(messages, response, usage_before)
+        return response
+
+
+class AsyncBudgetedCompletion(BudgetedCompletion):
+    async def __call__(self, messages, *args, **kwargs):
+        usage_before = self._before()
+        response = await self.function(messages, *args, **kwargs)
+        self._charge(messages, response, usage_before)
+        return response
+
+
+class BudgetedQuery:
+    """Replaces a player backend's query: refuses to start a turn without budget and trims the history as it runs down.
+
+    A player with a ContextWindow gets its whole history and a smaller window instead, which the summary keeps
+    up with; trimming in front of it would shift the messages it has summarized.
+    """
+
+    def __init__(self, budget: TokenBudget, function, agent: str, context=None):
+        self.budget = budget
+        self.function = function
+        self.agent = agent
+        self.context = context
+
+    async def _await(self, awaitable, history_messages):
+        with prompt_history(history_messages):
+            return await awaitable
+
+    def __call__(self, *args, history_messages, **kwargs):
+        self.budget.check(self.agent)
+        if self.context is not None:
+            self.context.limit = self.budget.history_limit(self.agent, len(history_messages))
+        else:
+            history_messages = self.budget.trim_history(self.agent, history_messages)
+        with prompt_history(history_messages):
+            result = self.function(*args, history_messages=history_messages, **kwargs)
+        return self._await(result, history_messages) if inspect.isawaitable(result) else result
+
+
+def budget_completions(budget: TokenBudget, backend, agent: str, adapt: bool = True) -> None:
+    if hasattr(backend, "_get_response"):
+        backend._get_response = BudgetedCompletion(budget, backend, backend._get_response, agent, adapt)
+    if hasattr(backend, "_async_get_response"):
+        backend._async_get_response = AsyncBudgetedCompletion(budget, backend, backend._async_get_response, agent, adapt)
+
+
+def apply_budget(arena, budget: TokenBudget) -> TokenBudget:
+    """Charges every player and Parser completion of the arena to `budget`, kept as `arena.budget`."""
+    for player in arena.players:
+        backend = player.backend
+        context = getattr(backend, "context", None)
+        backend.query = BudgetedQuery(budget, backend.query, player.name, context)
+        backend.async_query = BudgetedQuery(budget, backend.async_query, player.name, context)
+        if isinstance(backend, ReActWrapper):
+            backend = backend._backend
+        budget_completions(budget, backend, player.name)
+    parser = getattr(arena.environment, "parser", None)
+    if parser is not None:
+        budget_completions(budget, parser.backend, PARSER_NAME, adapt=False)
+    arena.budget = budget
+    return budget
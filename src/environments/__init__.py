@@ -1,4 +1,9 @@
+from .apples_to_apples import ApplesToApples
+from .avalon import Avalon
+from .bohnanza import Bohnanza
 from .chameleon import Chameleon
+from .deliberation import Deliberation
+from .hanabi import Hanabi
 from .once_upon_a_time import OnceUponATime
 from .prisoner import PrisonersDilemma
 from .public_good import PublicGood
@@ -0,0 +1,184 @@
+import random
+import re
+from typing import Dict, List, Optional
+
+from chatarena.environments import Environment, TimeStep, register_env
+from chatarena.message import Message, MessagePool
+
+from .base import PlayerObservations
+
+GREEN_CARDS = [
+    "Absurd", "Ancient", "Beautiful", "Bold", "Boring", "Brave", "Cheap", "Clean", "Clumsy", "Cold", "Creepy", "Cuddly",
+    "Dangerous", "Delicious", "Dirty", "Elegant", "Exciting", "Fake", "Famous", "Fancy", "Fast", "Fluffy", "Fragile",
+    "Funny", "Gigantic", "Graceful", "Heavy", "Hot", "Lazy", "Loud", "Lucky", "Magical", "Mysterious", "Noisy", "Old-fashioned",
+    "Powerful", "Quiet", "Ridiculous", "Romantic", "Scary", "Shiny", "Silly", "Slow", "Smelly", "Sticky", "Sweet", "Tiny",
+    "Tough", "Useless", "Weird",
+]
+RED_CARDS = [
+    "Abraham Lincoln", "Airplanes", "Alarm Clocks", "Aliens", "Antarctica", "Apple Pie", "Astronauts", "Babies", "Backpacks",
+    "Balloons", "Bananas", "Baseball", "Bathtubs", "Beaches", "Bees", "Bicycles", "Birthday Parties", "Black Holes", "Bowling",
+    "Bubble Wrap", "Cactus", "Camping", "Candles", "Castles", "Cats", "Cheese", "Chess", "Chocolate", "Circus Clowns",
+    "Cleopatra", "Coffee", "Cowboys", "Crocodiles", "Dentists", "Deserts", "Diamonds", "Dinosaurs", "Disco", "Dolphins",
+    "Dragons", "Dust Bunnies", "Earthquakes", "Elephants", "Elevators", "Fireworks", "Flamingos", "Football", "Frogs",
+    "Garbage Trucks", "Garlic", "Ghosts", "Giraffes", "Glaciers", "Gorillas", "Grandma's Kitchen", "Haircuts", "Halloween",
+    "Hamsters", "Helicopters", "Homework", "Hot Sauce", "Ice Cream", "Jellyfish", "Jungles", "Kangaroos", "Karaoke",
+    "Ketchup", "Knights", "Lawn Mowers", "Lemons", "Libraries", "Lighthouses", "Llamas", "Magicians", "Marshmallows",
+    "Meteors", "Monday Mornings", "Mosquitoes", "Mountains", "Mud", "Museums", "Mustaches", "Ninjas", "Octopuses", "Opera",
+    "Owls", "Pajamas", "Pancakes", "Penguins", "Pirates", "Pizza", "Politicians", "Popcorn", "Puppies", "Pyramids",
+    "Rainbows", "Robots", "Roller Coasters", "Rubber Ducks", "Sandcastles", "Scarecrows", "Sharks", "Skateboards",
+    "Skunks", "Snowmen", "Socks", "Spaghetti", "Spiders", "Submarines", "Sumo Wrestlers", "Sunglasses", "Superheroes",
+    "Swamps", "Taxes", "Teddy Bears", "Thunderstorms", "Toasters", "Tornadoes", "Traffic Jams", "Trampolines", "Turtles",
+    "Unicorns", "Vacuum Cleaners", "Vampires", "Volcanoes", "Waterfalls", "Whales", "Wizards", "Yoga", "Zombies",
+]
+HAND_SIZE = 7
+
+
+def cards_to_win(num_players: int) -> int:
+    """Green cards needed to win, by the official table."""
+    return min(8, max(4, 12 - num_players))
+
+
+@register_env
+class ApplesToApples(PlayerObservations, Environment):
+    """Apples to Apples for 3 to 10 players.
+
+    Every round all players but the judge submit a red card at once: `get_next_players` lists them, so the arena
+    asks them concurrently. The judge then sees every submission, anonymized, in one moderator message and picks
+    one, so a round takes one player round-trip plus one judge call at any player count. Submissions are matched
+    against the player's hand with a card-name index, without the Parser.
+    """
+    type_name = "apples_to_apples"
+
+    def __init__(self, player_names: List[str], green_cards: Optional[List[str]] = None, red_cards: Optional[List[str]] = None,
+                 target_score: Optional[int] = None, **kwargs):
+        super().__init__(player_names=player_names, green_cards=green_cards, red_cards=red_cards, target_score=target_score, **kwargs)
+        assert 3 <= len(player_names) <= 10, f"Apples to Apples needs 3 to 10 players, not {len(player_names)}"
+        self.green_cards = green_cards or GREEN_CARDS
+        self.red_cards = red_cards or RED_CARDS
+        assert len(self.red_cards) > HAND_SIZE * len(player_names), "Not enough red cards to deal every hand"
+        self.target_score = target_score or cards_to_win(len(player_names))
+        self.message_pool = MessagePool()
+        # Red card ids by lowercased name, and one pattern matching any of them, longest first
+        self.card_index: Dict[str, int] = {card.lower(): card_id for card_id, card in enumerate(self.red_cards)}
+        by_length = sorted(self.red_cards, key=len, reverse=True)
+        self._card_pattern = re.compile("|".join(rf"\b{re.escape(card)}\b" for card in by_length), re.IGNORECASE)
+        self.reset()
+
+    def reset(self) -> TimeStep:
+        self._reset_observations()
+        self.red_deck = list(range(len(self.red_cards)))
+        random.shuffle(self.red_deck)
+        self.red_discards: List[int] = []
+        self.green_deck = random.sample(self.green_cards, len(self.green_cards))
+        self.hands: Dict[str, List[int]] = {player: [] for player in self.player_names}
+        self.won: Dict[str, List[str]] = {player: [] for player in self.player_names}
+        self.judge = random.randrange(len(self.player_names))
+        self.winner: Optional[str] = None
+        self._moderator_speak(f"Now the game starts! The players are {', '.join(self.player_names)}. Each round a judge turns "
+                              f"over a green card and everyone else plays the red card from their hand that fits it best. "
+                              f"The first to win {self.target_score} green cards wins the game.")
+        self._begin_round()
+        return TimeStep(self.get_observation(), self.get_zero_rewards(), self.is_terminal())
+
+    @property
+    def judge_name(self) -> str:
+        return self.player_names[self.judge]
+
+    def _draw_red(self) -> int:
+        if not self.red_deck:
+            random.shuffle(self.red_discards)
+            self.red_deck, self.red_discards = self.red_discards, []
+        return self.red_deck.pop()
+
+    def _begin_round(self):
+        self._current_turn += 1
+        if not self.green_deck:
+            self.green_deck = random.sample(self.green_cards, len(self.green_cards))
+        self.green_card = self.green_deck.pop()
+        self.submissions: Dict[str, int] = {}
+        self.submission_order: List[str] = []
+        self._moderator_speak(f"Round {self._current_turn}: {self.judge_name} is the judge and the green card is "
+                              f"\"{self.green_card}\". Everyone else, play one red card from your hand.")
+        for player in self.player_names:
+            if player == self.judge_name:
+                continue
+            hand = self.hands[player]
+            while len(hand) < HAND_SIZE:
+                hand.append(self._draw_red())
+            self._moderator_speak(f"Your hand: {'; '.join(self.red_cards[card] for card in hand)}.", visible_to=[player])
+
+    def get_next_players(self) -> List[str]:
+        """Every player who has not submitted yet, or the judge once all have."""
+        waiting = [player for player in self.player_names if player != self.judge_name and player not in self.submissions]
+        return waiting or [self.judge_name]
+
+    def get_next_player(self) -> str:
+        return self.get_next_players()[0]
+
+    def named_cards(self, text: str, cards: List[int]) -> List[int]:
+        """The cards among `cards` that `text` names, last mention last."""
+        named = []
+        for match in self._card_pattern.findall(text):
+            card = self.card_index[match.lower()]
+            if card in cards:
+                if card in named:
+                    named.remove(card)
+                named.append(card)
+        return named
+
+    def _judged(self, action: str) -> Optional[int]:
+        """The index in `submission_order` of the submission the judge picked, by card name or number."""
+        submitted = [self.submissions[player] for player in self.submission_order]
+        named = self.named_cards(action, submitted)
+        if named:
+            return submitted.index(named[-1])
+        numbers = [int(number) for number in re.findall(r"\b(\d+)\b", action) if 1 <= int(number) <= len(submitted)]
+        return numbers[-1] - 1 if numbers else None
+
+    def check_action(self, action: str, player_name: str) -> bool:
+        if player_name == self.judge_name:
+            return self._judged(action) is not None
+        return bool(self.named_cards(action, self.hands[player_name]))
+
+    def _submit(self, player_name: str, action: str):
+        card = self.named_cards(action, self.hands[player_name])[-1]
+        self.hands[player_name].remove(card)
+        self.submissions[player_name] = card
+        self._add_message(Message(player_name, action, self._current_turn, visible_to=[player_name]))
+        if len(self.submissions) < len(self.player_names) - 1:
+            return
+        self.submission_order = random.sample(list(self.submissions), len(self.submissions))
+        listing = "\n".join(f"{number}. {self.red_cards[self.submissions[player]]}" for number, player in enumerate(self.submission_order, 1))
+        self._moderator_speak(f"The red cards played for \"{self.green_card}\" are:\n{listing}\n"
+                              f"{self.judge_name}, pick the one that fits best.")
+
+    def _judge(self, player_name: str, action: str):
+        self._add_message(Message(player_name, action, self._current_turn))
+        winner = self.submission_order[self._judged(action)]
+        self.won[winner].append(self.green_card)
+        self.red_discards += self.submissions.values()
+        score = ", ".join(f"{player}: {len(cards)}" for player, cards in self.won.items())
+        self._moderator_speak(f"{player_name} picked {self.red_cards[self.submissions[winner]]}, played by {winner}, "
+                              f"who wins \"{self.green_card}\". Green cards won: {score}.")
+        if len(self.won[winner]) >= self.target_score:
+            self.winner = winner
+            self._moderator_speak(f"{winner} wins the game!")
+        else:
+            self.judge = (self.judge + 1) % len(self.player_names)
+            self._begin_round()
+
+    def step(self, player_name: str, action: str) -> TimeStep:
+        assert player_name in self.get_next_players(), f"Wrong player! It is {self.get_next_players()} turn."
+        if player_name == self.judge_name:
+            self._judge(player_name, action)
+        else:
+            self._submit(player_name, action)
+        return TimeStep(observation=self.get_observation(), reward=self.get_rewards(), terminal=self.is_terminal())
+
+    def get_rewards(self) -> Dict[str, float]:
+        if self.winner is None:
+            return self.get_zero_rewards()
+        return {player: float(player == self.winner) for player in self.player_names}
+
+    def is_terminal(self) -> bool:
+        return self.winner is not None
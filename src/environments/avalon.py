@@ -1,82 +1,235 @@
+import random
+import re
 from enum import Enum
-from typing import List
+from typing import Dict, List, Optional
+
+from chatarena.environments import Environment, TimeStep, register_env
+from chatarena.message import Message, MessagePool
+
+from .base import PlayerObservations
+from .parser import Parser
+
+# Quest team sizes and number of evil players by number of players
+TEAM_SIZES = {5: [2, 3, 2, 3, 3], 6: [2, 3, 4, 3, 4], 7: [2, 3, 3, 4, 4], 8: [3, 4, 4, 5, 5], 9: [3, 4, 4, 5, 5], 10: [3, 4, 4, 5, 5]}
+EVIL_PLAYERS = {5: 2, 6: 2, 7: 3, 8: 3, 9: 3, 10: 4}
+MAX_REJECTIONS = 5
+QUESTS_TO_WIN = 3
 
-from chatarena.config import EnvironmentConfig
-from chatarena.environments import Environment, register_env, TimeStep
-from chatarena.message import Message
 
 class Phase(Enum):
     TEAM_SELECTION = 1
     VOTING = 2
     QUEST = 3
-    ASSASINATION = 4
+    ASSASSINATION = 4
+
 
 class Role(Enum):
     SERVANT = 1
     MINION = 2
     MERLIN = 3
-    ASSASIN = 4
-
-@register_env
-class Avalon(Environment):
-    type_name = None
+    ASSASSIN = 4
 
-    def __init__(self, player_names: List[str], **kwargs):
-        super().__init__(player_names=player_names, **kwargs)
+    @property
+    def evil(self) -> bool:
+        return self in (Role.MINION, Role.ASSASSIN)
 
-    def reset(self):
-        pass
 
+@register_env
+class Avalon(PlayerObservations, Environment):
+    """The Resistance: Avalon with Merlin and the Assassin.
+
+    Team votes and quest cards are simultaneous: `get_next_players` lists everyone who still has to act, so the
+    arena can ask them all at once, and nobody sees a vote or card before all are in. What each player may see
+    is decided once, as messages are spoken, so observations are never filtered.
+    """
+    type_name = "avalon"
+
+    def __init__(self, player_names: List[str], parser: Optional[dict] = None, **kwargs):
+        super().__init__(player_names=player_names, parser=parser, **kwargs)
+        assert len(player_names) in TEAM_SIZES, f"Avalon needs 5 to 10 players, not {len(player_names)}"
+        self.parser = Parser(**(parser or {}))
+        self.message_pool = MessagePool()
+        longest_first = sorted(player_names, key=len, reverse=True)
+        self._name_pattern = re.compile("|".join(rf"\b{re.escape(name)}(?!\w)" for name in longest_first), re.IGNORECASE)
+        self.reset()
+
+    def reset(self) -> TimeStep:
+        num_players = len(self.player_names)
+        roles = [Role.MERLIN, Role.ASSASSIN] + [Role.MINION] * (EVIL_PLAYERS[num_players] - 1)
+        roles += [Role.SERVANT] * (num_players - len(roles))
+        random.shuffle(roles)
+        self.roles: Dict[str, Role] = dict(zip(self.player_names, roles))
+        self.evil_players = [player for player, role in self.roles.items() if role.evil]
+        self.assassin = next(player for player, role in self.roles.items() if role == Role.ASSASSIN)
+        self._reset_observations()
+        self.leader = random.randrange(num_players)
+        self.quest_results: List[bool] = []
+        self.rejections = 0
+        self.team: List[str] = []
+        self.votes: Dict[str, bool] = {}
+        self.quest_cards: Dict[str, bool] = {}
+        self.winner: Optional[str] = None
+        self.phase = Phase.TEAM_SELECTION
+
+        self._moderator_speak(f"Now the game starts! The players are {', '.join(self.player_names)}; {len(self.evil_players)} of them are evil. "
+                              f"Good wins by completing {QUESTS_TO_WIN} quests, unless the Assassin then names Merlin. "
+                              f"Evil wins by failing {QUESTS_TO_WIN} quests, or when {MAX_REJECTIONS} teams in a row are rejected.")
+        for player, role in self.roles.items():
+            self._moderator_speak(self._role_briefing(player, role), visible_to=[player])
+        self._begin_team_selection()
+        return TimeStep(self.get_observation(), self.get_zero_rewards(), self.is_terminal())
+
+    def _role_briefing(self, player: str, role: Role) -> str:
+        if role == Role.MERLIN:
+            return f"You are Merlin, on the good side. The evil players are {', '.join(self.evil_players)}. Do not let the Assassin find you."
+        if role.evil:
+            others = [evil for evil in self.evil_players if evil != player]
+            title = "the Assassin" if role == Role.ASSASSIN else "a Minion of Mordred"
+            return f"You are {title}, on the evil side. The other evil players are {', '.join(others) or 'nobody'}."
+        return "You are a loyal Servant of Arthur, on the good side."
+
+    @property
+    def leader_name(self) -> str:
+        return self.player_names[self.leader]
+
+    @property
+    def team_size(self) -> int:
+        return TEAM_SIZES[len(self.player_names)][len(self.quest_results)]
+
+    @property
+    def fails_needed(self) -> int:
+        return 2 if len(self.quest_results) == 3 and len(self.player_names) >= 7 else 1
+
+    def get_next_players(self) -> List[str]:
+        """Everyone who may act now; more than one during team votes and quests."""
+        if self.phase == Phase.TEAM_SELECTION:
+            return [self.leader_name]
+        if self.phase == Phase.VOTING:
+            return [player for player in self.player_names if player not in self.votes]
+        if self.phase == Phase.QUEST:
+            return [player for player in self.team if player not in self.quest_cards]
+        return [self.assassin]
 
     def get_next_player(self) -> str:
-        pass
-
-    def get_observation(self, player_name=None) -> List[Message]:
-
-
-    def print(self):
-        pass
-
-    def step(self, player_name: str, action: str) -> TimeStep:
-        """
-        Execute a step in the environment given an action from a player.
-
-        Note:
-            This method must be implemented by subclasses.
-
-        Parameters:
-            player_name (str): The name of the player.
-            action (str): The action that the player wants to take.
-
-        Returns:
-            TimeStep: An object of the TimeStep class containing the observation, reward, and done state.
-        """
-        pass
+        return self.get_next_players()[0]
+
+    def named_players(self, text: str) -> List[str]:
+        by_lower = {name.lower(): name for name in self.player_names}
+        named = []
+        for match in self._name_pattern.findall(text):
+            name = by_lower[match.lower()]
+            if name not in named:
+                named.append(name)
+        return named
+
+    def _decision(self, action: str, choices: List[str], question: str) -> str:
+        found = [choice for choice in choices if re.search(rf"\b{choice}\b", action, re.IGNORECASE)]
+        if len(found) == 1:
+            return found[0]
+        quoted = " or ".join(f'"{choice}"' for choice in choices)
+        answer = self.parser(f'{question}\n>{action}\nSay only {quoted}.', choices=choices, subject=action).lower()
+        return next((choice for choice in choices if choice in answer), choices[-1])
 
     def check_action(self, action: str, player_name: str) -> bool:
-        """
-        Check whether a given action is valid for a player.
-
-        Note:
-            This method must be implemented by subclasses.
-
-        Parameters:
-            action (str): The action to be checked.
-            player_name (str): The name of the player.
-
-        Returns:
-            bool: True if the action is valid, False otherwise.
-        """
+        if self.phase == Phase.TEAM_SELECTION:
+            return len(self.named_players(action)) == self.team_size
+        if self.phase == Phase.ASSASSINATION:
+            return len(self.named_players(action)) >= 1
         return True
 
-    def is_terminal(self) -> bool:
-        """
-        Check whether the environment is in a terminal state (end of episode).
+    def _begin_team_selection(self):
+        self.phase = Phase.TEAM_SELECTION
+        self._current_turn += 1
+        self._moderator_speak(f"Quest {len(self.quest_results) + 1}: {self.leader_name} is the leader and must propose a team of "
+                              f"{self.team_size} players by naming them.")
+
+    def _next_leader(self):
+        self.leader = (self.leader + 1) % len(self.player_names)
+        self._begin_team_selection()
+
+    def _end_game(self, winner: str, reason: str):
+        self.winner = winner
+        self._moderator_speak(f"{reason} The {winner} side wins! The evil players were {', '.join(self.evil_players)}.")
+
+    def _select_team(self, player_name: str, action: str):
+        self.team = self.named_players(action)[:self.team_size]
+        self._add_message(Message(player_name, action, self._current_turn))
+        self.phase = Phase.VOTING
+        self.votes = {}
+        self._moderator_speak(f"{player_name} proposes the team {', '.join(self.team)}. Everyone now votes at the same time: "
+                              f"approve or reject this team?")
+
+    def _vote(self, player_name: str, action: str):
+        self.votes[player_name] = self._decision(action, ["approve", "reject"], "Did this player approve or reject the team?") == "approve"
+        self._add_message(Message(player_name, action, self._current_turn, visible_to=[player_name]))
+        if len(self.votes) < len(self.player_names):
+            return
+        approvals = sum(self.votes.values())
+        summary = ", ".join(f"{player}: {'approve' if vote else 'reject'}" for player, vote in self.votes.items())
+        if approvals * 2 > len(self.player_names):
+            self.rejections = 0
+            self.phase = Phase.QUEST
+            self.quest_cards = {}
+            self._moderator_speak(f"The team is approved ({summary}). {', '.join(self.team)} now go on the quest and each secretly "
+                                  f"plays success or fail.")
+            return
+        self.rejections += 1
+        self._moderator_speak(f"The team is rejected ({summary}). {self.rejections} team(s) rejected in a row.")
+        if self.rejections >= MAX_REJECTIONS:
+            self._end_game("evil", f"{MAX_REJECTIONS} teams in a row were rejected.")
+        else:
+            self._next_leader()
+
+    def _play_quest_card(self, player_name: str, action: str):
+        success = self._decision(action, ["success", "fail"], "Did this player play success or fail?") == "success"
+        # Good players can only play success
+        self.quest_cards[player_name] = success or not self.roles[player_name].evil
+        self._add_message(Message(player_name, action, self._current_turn, visible_to=[player_name]))
+        if len(self.quest_cards) < len(self.team):
+            return
+        fails = sum(not card for card in self.quest_cards.values())
+        succeeded = fails < self.fails_needed
+        self.quest_results.append(succeeded)
+        self._moderator_speak(f"Quest {len(self.quest_results)} {'succeeded' if succeeded else 'failed'} with {fails} fail card(s). "
+                              f"Quests so far: {', '.join('success' if result else 'fail' for result in self.quest_results)}.")
+        if sum(self.quest_results) >= QUESTS_TO_WIN:
+            self.phase = Phase.ASSASSINATION
+            self._current_turn += 1
+            self._moderator_speak(f"Good has completed {QUESTS_TO_WIN} quests. {self.assassin}, the Assassin, now names the player "
+                                  f"they think is Merlin.")
+        elif len(self.quest_results) - sum(self.quest_results) >= QUESTS_TO_WIN:
+            self._end_game("evil", f"{QUESTS_TO_WIN} quests failed.")
+        else:
+            self._next_leader()
+
+    def _assassinate(self, player_name: str, action: str):
+        target = self.named_players(action)[0]
+        self._add_message(Message(player_name, action, self._current_turn))
+        if self.roles[target] == Role.MERLIN:
+            self._end_game("evil", f"{player_name} found Merlin: {target}.")
+        else:
+            self._end_game("good", f"{target} was not Merlin.")
 
-        Note:
-            This method must be implemented by subclasses.
+    def step(self, player_name: str, action: str) -> TimeStep:
+        assert player_name in self.get_next_players(), f"Wrong player! It is {self.get_next_players()} turn."
+        if self.phase == Phase.TEAM_SELECTION:
+            self._select_team(player_name, action)
+        elif self.phase == Phase.VOTING:
+            self._vote(player_name, action)
+        elif self.phase == Phase.QUEST:
+            self._play_quest_card(player_name, action)
+        else:
+            self._assassinate(player_name, action)
+        return TimeStep(observation=self.get_observation(), reward=self.get_rewards(), terminal=self.is_terminal())
+
+    def player_roles(self) -> Dict[str, str]:
+        """Each player's role, for rating players per role."""
+        return {player: role.name.lower() for player, role in self.roles.items()}
+
+    def get_rewards(self) -> Dict[str, float]:
+        if self.winner is None:
+            return self.get_zero_rewards()
+        return {player: float(self.roles[player].evil == (self.winner == "evil")) for player in self.player_names}
 
-        Returns:
-            bool: True if the environment is in a terminal state, False otherwise.
-        """
-        pass
+    def is_terminal(self) -> bool:
+        return self.winner is not None
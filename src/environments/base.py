@@ -1,42 +1,99 @@
+import random
 from abc import abstractmethod
-from typing import Any, Dict, List, Type, Union
+from typing import Dict, List, Optional, Pattern, Type, Union
 
-from chatarena.backends import OpenAIChat
+import numpy as np
 from chatarena.environments import Environment
 from chatarena.environments.base import TimeStep
 from chatarena.message import Message, MessagePool
 
+from .parser import Parser
 
-class Parser:
-    def __init__(self) -> None:
-        self.backend = OpenAIChat(temperature=0.0)
 
-    def __call__(self, prompt: str) -> Any:
-        messages = [
-            {"role": "system", "content": 'You are a helpful assistant'},
-            {"role": "user", "content": prompt}
-            ]
-        return self.backend._get_response(messages) # type: ignore
+# Characters of each player's action quoted in a large-N round summary
+QUOTE_LENGTH = 200
+
+
+def distribution(values: np.ndarray) -> str:
+    return f"mean {values.mean():g}, median {np.median(values):g}, min {values.min():g}, max {values.max():g}"
+
+
+def structured_decision(action: str, pattern: Pattern) -> Optional[str]:
+    """The last decision block in a player's answer, e.g. the "cooperate" of "DECISION: cooperate", if there is one."""
+    matches = pattern.findall(action)
+    return matches[-1].lower() if matches else None
+
+
+class PlayerObservations:
+    """Keeps each player's observation as its own list, appended to as messages are spoken, so observing
+    never filters the message pool. Mix in before `Environment` and call `_reset_observations` in `reset`."""
+
+    def _reset_observations(self):
+        self.message_pool.reset()
+        self._observations: Dict[str, List[Message]] = {player: [] for player in self.player_names}
+        self._current_turn = 0
+
+    def _add_message(self, message: Message):
+        self.message_pool.append_message(message)
+        recipients = self.player_names if message.visible_to == "all" else message.visible_to
+        for player in recipients:
+            if player in self._observations:
+                self._observations[player].append(message)
+
+    def _moderator_speak(self, text: str, visible_to: Union[str, List[str]] = "all"):
+        self._add_message(Message(agent_name="Moderator", content=text, turn=self._current_turn, visible_to=visible_to))
+
+    def get_observation(self, player_name=None) -> List[Message]:
+        if player_name is None:
+            return self.message_pool.get_all_messages()
+        return list(self._observations[player_name])
 
 
 class Round:
     def __init__(self, player_names: List[str], round_number: int) -> None:
-        self.player_actions = {}
+        # Actions by player number, None until the player has acted
+        self.actions: List[Optional[str]] = [None] * len(player_names)
+        self.num_actions = 0
         self.player_names = player_names
         self.round_number = round_number
 
+    @property
+    def player_actions(self) -> Dict[str, str]:
+        return {player: action for player, action in zip(self.player_names, self.actions) if action is not None}
+
     @property
     def is_complete(self) -> bool:
-        return len(self.player_actions) == len(self.player_names)
+        return self.num_actions == len(self.player_names)
 
-    def process_action(self, player_name: str, action: str):
-        self.player_actions[player_name] = action
+    def process_action(self, player_name: str, action: str, player_index: Optional[int] = None):
+        if player_index is None:
+            player_index = self.player_names.index(player_name)
+        self.num_actions += self.actions[player_index] is None
+        self.actions[player_index] = action
 
 
 class SimpleRoundEnvironment(Environment):
-    def __init__(self, *args, total_rounds: int, **kwargs):
-        super().__init__(*args, **kwargs)
+    # Told to the players when `structured_actions` is on: how to state their decision machine-readably
+    decision_instruction: Optional[str] = None
+
+    def __init__(self, *args, total_rounds: int, parser: Optional[dict] = None, structured_actions: bool = False,
+                 large_n: bool = False, sampled_quotes: int = 3, **kwargs):
+        """With `structured_actions`, players are asked to end their answer with a decision block that is read
+        without the Parser; the Parser only judges answers that lack one.
+
+        `large_n` is for games of 50-500 players: instead of every player's action, the end of a round is announced
+        with aggregate statistics and `sampled_quotes` randomly chosen actions, and each player is told their own
+        outcome privately. A player then observes the public messages and their latest outcome, so their history
+        grows by a constant per round rather than by the number of players.
+        """
+        super().__init__(*args, parser=parser, structured_actions=structured_actions, large_n=large_n,
+                         sampled_quotes=sampled_quotes, **kwargs)
         self.total_rounds = total_rounds
+        self.parser = Parser(**(parser or {}))
+        self.structured_actions = structured_actions
+        self.large_n = large_n
+        self.sampled_quotes = sampled_quotes
+        self.player_index = {player: index for index, player in enumerate(self.player_names)}
         self._initialized = False
         self.message_pool = MessagePool()
         self.reset()
@@ -45,9 +102,8 @@ class SimpleRoundEnvironment(Environment):
     def round_class(self) -> Type[Round]:
         return Round
 
-    @abstractmethod
     def player_scores(self) -> Dict[str, float]:
-        pass
+        return dict(zip(self.player_names, self.scores.tolist()))
 
     @abstractmethod
     def begin_game(self):
@@ -64,8 +120,14 @@ class SimpleRoundEnvironment(Environment):
     def reset(self):
         self.rounds = []
         self.message_pool.reset()
+        # Scores by player number
+        self.scores = np.zeros(len(self.player_names))
+        self._public_messages: List[Message] = []
+        self._outcomes: List[Optional[Message]] = [None] * len(self.player_names)
         self._moderator_speak(f"Now the game starts! There are {self.total_rounds} rounds.")
         self.begin_game()
+        if self.structured_actions and self.decision_instruction:
+            self._moderator_speak(self.decision_instruction)
         self.increment_round()
         self.begin_round()
         self._initialized = True
@@ -88,6 +150,23 @@ class SimpleRoundEnvironment(Environment):
         """
         message = Message(agent_name="Moderator", content=text, turn=len(self.rounds), visible_to=visible_to)
         self.message_pool.append_message(message)
+        if visible_to == "all":
+            self._public_messages.append(message)
+
+    def _tell_outcomes(self, outcomes: List[str]):
+        """Tells each player, by player number, their own outcome of the round; each replaces the last."""
+        for index, (player, outcome) in enumerate(zip(self.player_names, outcomes)):
+            message = Message(agent_name="Moderator", content=outcome, turn=len(self.rounds), visible_to=[player])
+            self.message_pool.append_message(message)
+            self._outcomes[index] = message
+
+    def quotes(self, round: Round) -> str:
+        """`sampled_quotes` randomly chosen actions of the round, shortened, for a large-N summary."""
+        if not self.sampled_quotes:
+            return ""
+        sampled = random.sample(range(len(self.player_names)), min(self.sampled_quotes, len(self.player_names)))
+        return "\nSome of what players said:\n" + "\n".join(
+            f"{self.player_names[index]}: {round.actions[index][:QUOTE_LENGTH]}" for index in sorted(sampled))
 
     def get_next_player(self) -> str:
         """
@@ -101,21 +180,26 @@ class SimpleRoundEnvironment(Environment):
         """
         if player_name is None:
             return self.message_pool.get_all_messages()
-        else:
-            return self.message_pool.get_visible_messages(player_name, turn=len(self.rounds))
+        if self.large_n:
+            outcome = self._outcomes[self.player_index[player_name]]
+            return self._public_messages + ([outcome] if outcome else [])
+        return self.message_pool.get_visible_messages(player_name, turn=len(self.rounds))
 
     def step(self, player_name: str, action: str) -> TimeStep:
         assert player_name == self.get_next_player(), f"Wrong player! It is {self.get_next_player()} turn."
         message = Message(agent_name=player_name, content=action, turn=len(self.rounds), visible_to="Moderator")
         self.message_pool.append_message(message)
-        self.current_round.process_action(player_name, action)
+        self.current_round.process_action(player_name, action, self._next_player_idx)
         self._next_player_idx += 1
         if self.current_round.is_complete:
             self.complete_round()
 
             if self.is_terminal():
                 self._moderator_speak(f"{self.total_rounds} rounds of decisions have been completed.")
-                self._moderator_speak(f"The scores are {self.player_scores()}")
+                if self.large_n:
+                    self._moderator_speak(f"The final scores are: {distribution(self.scores)}.")
+                else:
+                    self._moderator_speak(f"The scores are {self.player_scores()}")
                 return TimeStep(observation=self.get_observation(), reward=self.player_scores(), terminal=True)
         
             self.increment_round()
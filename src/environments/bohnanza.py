@@ -0,0 +1,300 @@
+import random
+import re
+from array import array
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+
+from chatarena.environments import Environment, TimeStep, register_env
+from chatarena.message import Message, MessagePool
+
+from .base import PlayerObservations
+
+# Bean type: (name, cards in the deck, beans needed for 1, 2, 3 and 4 coins; 0 where there is no such payout)
+BEANS = (
+    ("coffee", 24, (4, 7, 10, 12)),
+    ("wax", 22, (4, 7, 9, 11)),
+    ("blue", 20, (4, 6, 8, 10)),
+    ("chili", 18, (3, 6, 8, 9)),
+    ("stink", 16, (3, 5, 7, 8)),
+    ("green", 14, (3, 5, 6, 7)),
+    ("soy", 12, (2, 4, 6, 7)),
+    ("black-eyed", 10, (2, 4, 5, 6)),
+    ("red", 8, (2, 3, 4, 5)),
+    ("garden", 6, (0, 2, 3, 0)),
+)
+BEAN_NAMES = tuple(name for name, _, _ in BEANS)
+BEAN_INDEX = {name: bean for bean, name in enumerate(BEAN_NAMES)}
+# Coins for harvesting n beans of each type, up to the largest possible field
+HARVEST_COINS = tuple(tuple(sum(1 for needed in meter if needed and needed <= n) for n in range(count + 1)) for _, count, meter in BEANS)
+FULL_DECK = bytes(bean for bean, (_, count, _) in enumerate(BEANS) for _ in range(count))
+HAND_SIZE = 5
+FIELDS = 2
+EMPTY = 255
+CARDS_TURNED = 2
+CARDS_DRAWN = 3
+
+BEAN_PATTERN = re.compile(rf"(?:(\d+)\s*x?\s*)?\b({'|'.join(re.escape(name) for name in BEAN_NAMES)})(?:\s+beans?)?\b", re.IGNORECASE)
+OFFER_PATTERN = re.compile(r"OFFER:\s*(.*?)\s+for\s+([^\n]*)", re.IGNORECASE)
+
+
+class Phase(Enum):
+    PLANT = 1
+    OFFERS = 2
+    RESOLVE = 3
+
+
+def bean_counts(text: str) -> Optional[List[int]]:
+    """How many of each bean `text` lists, e.g. "2 chili, soy"; an empty list for "nothing", None if unreadable."""
+    counts = [0] * len(BEANS)
+    text = text.strip().rstrip(".")
+    if text.lower() in ("nothing", "none", ""):
+        return counts
+    matches = BEAN_PATTERN.findall(text)
+    if not matches:
+        return None
+    for number, name in matches:
+        counts[BEAN_INDEX[name.lower()]] += int(number or 1)
+    return counts
+
+
+def describe(counts: List[int]) -> str:
+    return ", ".join(f"{count} {BEAN_NAMES[bean]}" for bean, count in enumerate(counts) if count) or "nothing"
+
+
+def has(cards: bytes, counts: List[int]) -> bool:
+    return all(cards.count(bean) >= count for bean, count in enumerate(counts) if count)
+
+
+@register_env
+class Bohnanza(PlayerObservations, Environment):
+    """Bohnanza for 3 to 5 players, with one pass through the deck and two bean fields each.
+
+    Each turn the active player decides whether to plant one or two cards from the front of their hand and turns
+    over two cards. Then every other player makes an offer at once ("OFFER: 2 chili for blue", or "PASS");
+    `get_next_players` lists them, so the arena asks them concurrently. The active player then accepts any of the
+    offers in one decision. Offers are checked against the hands and the face-up cards, and planting and
+    harvesting are automatic, so no move needs the Parser. A field is harvested, for the coins the bean-o-meter
+    pays, when a bean needs its space; the richest player when the deck runs out wins.
+    """
+    type_name = "bohnanza"
+
+    def __init__(self, player_names: List[str], **kwargs):
+        super().__init__(player_names=player_names, **kwargs)
+        assert 3 <= len(player_names) <= 5, f"Bohnanza needs 3 to 5 players, not {len(player_names)}"
+        self.message_pool = MessagePool()
+        self.player_index = {player: index for index, player in enumerate(player_names)}
+        longest_first = sorted(player_names, key=len, reverse=True)
+        self._name_pattern = re.compile("|".join(rf"\b{re.escape(name)}(?!\w)" for name in longest_first), re.IGNORECASE)
+        self.reset()
+
+    def reset(self) -> TimeStep:
+        self._reset_observations()
+        deck = bytearray(FULL_DECK)
+        random.shuffle(deck)
+        self.deck = deck
+        num_players = len(self.player_names)
+        # Hands are in planting order, front first
+        self.hands = [bytearray(self.deck.pop() for _ in range(HAND_SIZE)) for _ in range(num_players)]
+        # Per player, (bean, count) for each field
+        self.fields = [bytearray([EMPTY, 0] * FIELDS) for _ in range(num_players)]
+        self.coins = array("H", [0] * num_players)
+        self.active = 0
+        self.finished = False
+        self._moderator_speak(f"Now the game starts! The players are {', '.join(self.player_names)}. Beans, with how many of "
+                              f"each are needed for 1, 2, 3 and 4 coins: " +
+                              "; ".join(f"{name} {'/'.join(str(needed or '-') for needed in meter)}" for name, _, meter in BEANS) + ".")
+        self._begin_turn()
+        return TimeStep(self.get_observation(), self.get_zero_rewards(), self.is_terminal())
+
+    @property
+    def active_name(self) -> str:
+        return self.player_names[self.active]
+
+    def fields_text(self, player: int) -> str:
+        fields = self.fields[player]
+        planted = [f"{fields[2 * field + 1]} {BEAN_NAMES[fields[2 * field]]}" for field in range(FIELDS) if fields[2 * field] != EMPTY]
+        return ", ".join(planted) or "empty"
+
+    def _table_text(self) -> str:
+        return "; ".join(f"{player}: fields {self.fields_text(index)}, {self.coins[index]} coins, {len(self.hands[index])} cards"
+                         for index, player in enumerate(self.player_names))
+
+    def _hand_text(self, player: int) -> str:
+        return ", ".join(BEAN_NAMES[bean] for bean in self.hands[player]) or "empty"
+
+    def plant(self, player: int, bean: int) -> Optional[str]:
+        """Plants `bean`, harvesting a field first if none can take it; returns what was harvested, if anything."""
+        fields = self.fields[player]
+        for field in range(FIELDS):
+            if fields[2 * field] == bean:
+                fields[2 * field + 1] += 1
+                return None
+        harvested = None
+        if EMPTY not in fields[::2]:
+            # Harvest the field that pays most, or the smaller one if they pay the same
+            field = max(range(FIELDS), key=lambda f: (HARVEST_COINS[fields[2 * f]][fields[2 * f + 1]], -fields[2 * f + 1]))
+            harvested = self.harvest(player, field)
+        field = fields[::2].index(EMPTY)
+        fields[2 * field], fields[2 * field + 1] = bean, 1
+        return harvested
+
+    def harvest(self, player: int, field: int) -> str:
+        fields = self.fields[player]
+        bean, count = fields[2 * field], fields[2 * field + 1]
+        coins = HARVEST_COINS[bean][count]
+        self.coins[player] += coins
+        fields[2 * field], fields[2 * field + 1] = EMPTY, 0
+        return f"{self.player_names[player]} harvested {count} {BEAN_NAMES[bean]} for {coins} coin(s)"
+
+    def _plant_all(self, player: int, beans) -> List[str]:
+        return [harvest for harvest in (self.plant(player, bean) for bean in beans) if harvest]
+
+    def _begin_turn(self):
+        self._current_turn += 1
+        self.offers: Dict[str, Optional[Tuple[List[int], List[int]]]] = {}
+        self.trade_area = bytearray()
+        self._moderator_speak(f"Turn {self._current_turn}: it is {self.active_name}'s turn. {self._table_text()}.")
+        if self.hands[self.active]:
+            self.phase = Phase.PLANT
+            self._moderator_speak(f"Your hand, front first: {self._hand_text(self.active)}. You must plant the front card; "
+                                  f"say \"plant one\" to stop there or \"plant two\" to plant the next card too.",
+                                  visible_to=[self.active_name])
+        else:
+            self._turn_over()
+
+    def _turn_over(self):
+        for _ in range(min(CARDS_TURNED, len(self.deck))):
+            self.trade_area.append(self.deck.pop())
+        self.phase = Phase.OFFERS
+        self._moderator_speak(f"{self.active_name} turns over {describe([self.trade_area.count(bean) for bean in range(len(BEANS))])}. "
+                              f"Everyone else now makes an offer at the same time, for these or for cards in {self.active_name}'s hand: "
+                              f"\"OFFER: <beans from your hand, or nothing> for <beans you want>\", or \"PASS\".")
+        for index, player in enumerate(self.player_names):
+            if index != self.active:
+                self._moderator_speak(f"Your hand: {self._hand_text(index)}.", visible_to=[player])
+
+    def get_next_players(self) -> List[str]:
+        if self.phase == Phase.OFFERS:
+            return [player for player in self.player_names if player != self.active_name and player not in self.offers]
+        return [self.active_name]
+
+    def get_next_player(self) -> str:
+        return self.get_next_players()[0]
+
+    def parse_offer(self, action: str) -> Optional[Tuple[List[int], List[int]]]:
+        """(beans given, beans wanted) of the last OFFER line, or None for a pass or an unreadable offer."""
+        matches = OFFER_PATTERN.findall(action)
+        if not matches:
+            return None
+        give, want = (bean_counts(side) for side in matches[-1])
+        if give is None or want is None or not any(give) and not any(want):
+            return None
+        return give, want
+
+    def _offer_legal(self, player: int, offer: Tuple[List[int], List[int]]) -> bool:
+        give, want = offer
+        return has(self.hands[player], give) and has(self.trade_area + self.hands[self.active], want)
+
+    def check_action(self, action: str, player_name: str) -> bool:
+        if self.phase == Phase.PLANT:
+            return bool(re.search(r"\bplant (one|two|1|2)\b", action, re.IGNORECASE))
+        if self.phase == Phase.OFFERS:
+            offer = self.parse_offer(action)
+            if offer is None:
+                return bool(re.search(r"\bpass\b", action, re.IGNORECASE))
+            return self._offer_legal(self.player_index[player_name], offer)
+        return bool(re.search(r"\bACCEPT:", action, re.IGNORECASE))
+
+    def _plant_step(self, action: str):
+        plants = re.findall(r"\bplant (one|two|1|2)\b", action, re.IGNORECASE)[-1].lower()
+        hand = self.hands[self.active]
+        planted = [hand.pop(0)]
+        if plants in ("two", "2") and hand:
+            planted.append(hand.pop(0))
+        harvests = self._plant_all(self.active, planted)
+        self._moderator_speak(f"{self.active_name} plants {', '.join(BEAN_NAMES[bean] for bean in planted)}."
+                              + "".join(f" {harvest}." for harvest in harvests))
+        self._turn_over()
+
+    def _offer_step(self, player_name: str, action: str):
+        self.offers[player_name] = self.parse_offer(action)
+        self._add_message(Message(player_name, action, self._current_turn, visible_to=[player_name]))
+        if len(self.offers) < len(self.player_names) - 1:
+            return
+        self.phase = Phase.RESOLVE
+        listing = "; ".join(f"{player}: gives {describe(offer[0])} for {describe(offer[1])}" if offer else f"{player}: pass"
+                            for player, offer in self.offers.items())
+        self._moderator_speak(f"Offers: {listing}.")
+        self._moderator_speak(f"Your hand, front first: {self._hand_text(self.active)}. Accept any of the offers at once with "
+                              f"\"ACCEPT: <players>\", or \"ACCEPT: none\". The face-up cards left over are planted in your fields.",
+                              visible_to=[self.active_name])
+
+    def _take(self, counts: List[int]) -> List[int]:
+        """Removes the wanted beans from the face-up cards first, then from the active player's hand."""
+        taken = []
+        for bean, count in enumerate(counts):
+            for _ in range(count):
+                source = self.trade_area if bean in self.trade_area else self.hands[self.active]
+                source.remove(bean)
+                taken.append(bean)
+        return taken
+
+    def _resolve_step(self, action: str):
+        by_lower = {player.lower(): player for player in self.player_names}
+        accepted = self._name_pattern.findall(re.split(r"ACCEPT:", action, flags=re.IGNORECASE)[-1])
+        results = []
+        for player_name in dict.fromkeys(by_lower[name.lower()] for name in accepted):
+            offer = self.offers.get(player_name)
+            player = self.player_index[player_name]
+            # Earlier trades may have used the cards a later offer wants
+            if not offer or not self._offer_legal(player, offer):
+                continue
+            give, want = offer
+            given = [bean for bean, count in enumerate(give) for _ in range(count)]
+            for bean in given:
+                self.hands[player].remove(bean)
+            harvests = self._plant_all(player, self._take(want)) + self._plant_all(self.active, given)
+            results.append(f"{self.active_name} trades with {player_name}: {describe(give)} for {describe(want)}.")
+            results += [f"{harvest}." for harvest in harvests]
+        self._add_message(Message(self.active_name, action, self._current_turn))
+        results.append(f"{self.active_name} plants the remaining face-up cards.")
+        results += [f"{harvest}." for harvest in self._plant_all(self.active, self.trade_area)]
+        self.trade_area = bytearray()
+        self._moderator_speak(" ".join(results))
+        if len(self.deck) < CARDS_DRAWN:
+            self._end_game()
+            return
+        self.hands[self.active] += bytes(self.deck.pop() for _ in range(CARDS_DRAWN))
+        self.active = (self.active + 1) % len(self.player_names)
+        self._begin_turn()
+
+    def _end_game(self):
+        self.finished = True
+        for player in range(len(self.player_names)):
+            for field in range(FIELDS):
+                if self.fields[player][2 * field] != EMPTY:
+                    self.harvest(player, field)
+        best = max(self.coins)
+        winners = [player for index, player in enumerate(self.player_names) if self.coins[index] == best]
+        self._moderator_speak(f"The deck has run out, and every field is harvested. Coins: "
+                              f"{', '.join(f'{player}: {self.coins[index]}' for index, player in enumerate(self.player_names))}. "
+                              f"{' and '.join(winners)} win{'s' if len(winners) == 1 else ''}!")
+
+    def step(self, player_name: str, action: str) -> TimeStep:
+        assert player_name in self.get_next_players(), f"Wrong player! It is {self.get_next_players()} turn."
+        if self.phase == Phase.PLANT:
+            self._add_message(Message(player_name, action, self._current_turn))
+            self._plant_step(action)
+        elif self.phase == Phase.OFFERS:
+            self._offer_step(player_name, action)
+        else:
+            self._resolve_step(action)
+        return TimeStep(observation=self.get_observation(), reward=self.get_rewards(), terminal=self.is_terminal())
+
+    def get_rewards(self) -> Dict[str, float]:
+        if not self.finished:
+            return self.get_zero_rewards()
+        return {player: float(self.coins[index]) for index, player in enumerate(self.player_names)}
+
+    def is_terminal(self) -> bool:
+        return self.finished
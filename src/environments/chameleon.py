@@ -1,3 +1,5 @@
+from typing import Optional
+
 from chatarena.environments import Chameleon, register_env
 
 from .base import Parser
@@ -10,16 +12,18 @@ class ImprovedModerationChameleon(Chameleon):
     def __init__(
         self,
         *args,
+        parser: Optional[dict] = None,
         **kwargs,
     ):
-        super().__init__(*args, **kwargs)
-        self.parser = Parser()
+        super().__init__(*args, parser=parser, **kwargs)
+        self.parser = Parser(**(parser or {}))
 
 
     def _text2vote(self, text) -> str:
         """Convert text to vote, return a player's name."""
         # lower = text.lower().replace("[", "").replace("]", "").replace(".", "")
-        text = self.parser(f'Who did the speaker think the chameleon was? Or who did they vote for as the chameleon?\n{text}\nJust return the name of the player.')
+        text = self.parser(f'Who did the speaker think the chameleon was? Or who did they vote for as the chameleon?\n{text}\nJust return the name of the player.',
+                           choices=self.player_names, subject=text, hypothesis="The speaker voted for {} as the chameleon.")
         
         text = text.lower()
         for name in self.player_names:
@@ -36,6 +40,7 @@ class ImprovedModerationChameleon(Chameleon):
         """Check whether the text is the true code."""
         # Get the word enclosed by quote marks with regex
         code: str = self.code # type: ignore
-        text = self.parser(f'Did the speaker guess the word {code} correctly? Here is what they guessed:\n{text}\nJust answer "correct" or "incorrect".')
+        text = self.parser(f'Did the speaker guess the word {code} correctly? Here is what they guessed:\n{text}\nJust answer "correct" or "incorrect".',
+                           choices={code: "correct", "a different word": "incorrect"}, subject=text, hypothesis="The speaker guessed {}.")
         return 'correct' in text.lower() and 'incorrect' not in text.lower()
 
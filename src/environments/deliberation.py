@@ -0,0 +1,201 @@
+import re
+from array import array
+from collections import deque
+from typing import Dict, List, Optional
+
+from chatarena.environments import Environment, TimeStep, register_env
+from chatarena.message import Message, MessagePool
+
+from .parser import Parser
+
+VOTE_PATTERN = re.compile(r"VOTE:\s*([^\n]+)", re.IGNORECASE)
+NO_VOTE = -1
+# Characters of each contribution quoted in an extractive summary
+QUOTE_LENGTH = 200
+
+
+@register_env
+class Deliberation(Environment):
+    """A group of 20-100 agents deliberating until enough of them agree on one of `options`.
+
+    Each round the next `speakers_per_round` agents in the speaking queue draft contributions at once, and every
+    `poll_every` rounds all agents vote at once; `get_next_players` lists who may act, so the arena asks them
+    concurrently. Agents who change their vote in a poll move to the front of the queue. Every `summary_every`
+    rounds the moderator summarizes the discussion, and an agent observes only the introduction, the latest
+    summary and the contributions since, so observations stay bounded however long the deliberation runs.
+    Summaries are extractive unless `llm_summaries` asks the Parser to write them. Votes are tallied from
+    "VOTE: <option>" lines, and deliberation ends once a `consensus` share of all agents votes for one option.
+    """
+    type_name = "deliberation"
+
+    def __init__(self, player_names: List[str], topic: str, options: List[str], speakers_per_round: int = 5,
+                 poll_every: int = 2, summary_every: int = 2, consensus: float = 0.75, max_rounds: int = 10,
+                 llm_summaries: bool = False, parser: Optional[dict] = None, **kwargs):
+        super().__init__(player_names=player_names, topic=topic, options=options, speakers_per_round=speakers_per_round,
+                         poll_every=poll_every, summary_every=summary_every, consensus=consensus, max_rounds=max_rounds,
+                         llm_summaries=llm_summaries, parser=parser, **kwargs)
+        assert len(options) >= 2, "Deliberation needs at least two options"
+        self.topic = topic
+        self.options = options
+        self.speakers_per_round = min(speakers_per_round, len(player_names))
+        self.poll_every = poll_every
+        self.summary_every = summary_every
+        self.consensus = consensus
+        self.max_rounds = max_rounds
+        self.llm_summaries = llm_summaries
+        # Extractive summaries need no LLM
+        self.parser = Parser(**(parser or {})) if llm_summaries else None
+        self.player_index = {player: index for index, player in enumerate(player_names)}
+        # Option index by lowercased label and by number
+        self.option_index: Dict[str, int] = {option.lower(): index for index, option in enumerate(options)}
+        self.option_index.update({str(index + 1): index for index in range(len(options))})
+        self.message_pool = MessagePool()
+        self.reset()
+
+    def reset(self) -> TimeStep:
+        self.message_pool.reset()
+        self.round = 1
+        self.votes = array("b", [NO_VOTE] * len(self.player_names))
+        self.queue = deque(self.player_names)
+        self.consensus_option: Optional[int] = None
+        self.finished = False
+        self.summary: Optional[Message] = None
+        self.recent: List[Message] = []
+        listing = "; ".join(f"{index + 1}. {option}" for index, option in enumerate(self.options))
+        self.introduction = self._moderator_speak(
+            f"Now the deliberation starts! {len(self.player_names)} participants will discuss: {self.topic}\nOptions: {listing}.\n"
+            f"A few participants speak each round, and everyone votes in regular polls. Say \"VOTE: <option number>\" to vote. "
+            f"It ends when {self.consensus:.0%} of all participants vote for the same option, or after {self.max_rounds} rounds.")
+        self._begin_drafting()
+        return TimeStep(self.get_observation(), self.get_zero_rewards(), self.is_terminal())
+
+    def _moderator_speak(self, text: str) -> Message:
+        message = Message(agent_name="Moderator", content=text, turn=self.round)
+        self.message_pool.append_message(message)
+        return message
+
+    def _begin_drafting(self):
+        self.polling = False
+        self.speakers = [self.queue.popleft() for _ in range(self.speakers_per_round)]
+        self.queue.extend(self.speakers)
+        self.drafts: Dict[str, str] = {}
+        self.prompt = self._moderator_speak(f"Round {self.round}: {', '.join(self.speakers)}, make your contribution. "
+                                            f"You may end it with your vote.")
+
+    def _begin_poll(self):
+        self.polling = True
+        self.ballots: Dict[str, str] = {}
+        self.prompt = self._moderator_speak(f"Poll after round {self.round}: everyone, reply with \"VOTE: <option number>\".")
+
+    def get_next_players(self) -> List[str]:
+        if self.polling:
+            return [player for player in self.player_names if player not in self.ballots]
+        return [player for player in self.speakers if player not in self.drafts]
+
+    def get_next_player(self) -> str:
+        return self.get_next_players()[0]
+
+    def get_observation(self, player_name=None) -> List[Message]:
+        """For an agent, the introduction, the latest summary, the contributions since and the current prompt."""
+        if player_name is None:
+            return self.message_pool.get_all_messages()
+        return [self.introduction] + ([self.summary] if self.summary else []) + self.recent + [self.prompt]
+
+    def parse_vote(self, action: str) -> Optional[int]:
+        """The option of the last "VOTE:" line, by number or label, or None."""
+        matches = VOTE_PATTERN.findall(action)
+        if not matches:
+            return None
+        vote = matches[-1].strip().strip(".\"'*").lower()
+        if vote in self.option_index:
+            return self.option_index[vote]
+        number = re.match(r"\d+", vote)
+        return self.option_index.get(number.group()) if number else None
+
+    def check_action(self, action: str, player_name: str) -> bool:
+        return not self.polling or self.parse_vote(action) is not None
+
+    def tally(self) -> List[int]:
+        counts = [0] * len(self.options)
+        for vote in self.votes:
+            if vote != NO_VOTE:
+                counts[vote] += 1
+        return counts
+
+    def _tally_text(self) -> str:
+        counts = self.tally()
+        undecided = len(self.player_names) - sum(counts)
+        return ", ".join(f"{option}: {count}" for option, count in zip(self.options, counts)) + f", undecided: {undecided}"
+
+    def _summarize(self):
+        contributions = [message for message in self.recent if message.agent_name != "Moderator"]
+        if self.llm_summaries:
+            previous = self.summary.content if self.summary else "none"
+            points = "\n".join(f"{message.agent_name}: {message.content}" for message in contributions)
+            text = self.parser(f"Summarize this deliberation on \"{self.topic}\" in at most 150 words, keeping the main "
+                               f"arguments for each option.\nEarlier summary: {previous}\nNew contributions:\n{points}")
+        else:
+            text = "Points made: " + " | ".join(f"{message.agent_name}: {message.content[:QUOTE_LENGTH]}" for message in contributions)
+        self.summary = self._moderator_speak(f"Summary after round {self.round}. Current votes: {self._tally_text()}.\n{text}")
+        self.recent = []
+
+    def _check_consensus(self):
+        counts = self.tally()
+        best = max(range(len(counts)), key=counts.__getitem__)
+        if counts[best] >= self.consensus * len(self.player_names):
+            self.consensus_option = best
+            self.finished = True
+            self._moderator_speak(f"Consensus reached on \"{self.options[best]}\" ({self._tally_text()}).")
+        elif self.round >= self.max_rounds:
+            self.finished = True
+            self._moderator_speak(f"No consensus after {self.max_rounds} rounds ({self._tally_text()}).")
+
+    def _end_round(self):
+        if self.round % self.summary_every == 0:
+            self._summarize()
+        if self.round % self.poll_every == 0 or self.round >= self.max_rounds:
+            self._begin_poll()
+        else:
+            self._next_round()
+
+    def _next_round(self):
+        self.round += 1
+        self._begin_drafting()
+
+    def step(self, player_name: str, action: str) -> TimeStep:
+        assert player_name in self.get_next_players(), f"Wrong player! It is {self.get_next_players()} turn."
+        index = self.player_index[player_name]
+        vote = self.parse_vote(action)
+        if self.polling:
+            self.ballots[player_name] = action
+            self.message_pool.append_message(Message(player_name, action, self.round, visible_to="Moderator"))
+            if vote is not None and self.votes[index] not in (NO_VOTE, vote):
+                # A changed mind has something new to say
+                self.queue.remove(player_name)
+                self.queue.appendleft(player_name)
+            if vote is not None:
+                self.votes[index] = vote
+            if len(self.ballots) == len(self.player_names):
+                self._check_consensus()
+                if not self.finished:
+                    self._next_round()
+        else:
+            self.drafts[player_name] = action
+            if vote is not None:
+                self.votes[index] = vote
+            if len(self.drafts) == len(self.speakers):
+                # Contributions drafted at the same time are revealed together
+                for speaker in self.speakers:
+                    message = Message(speaker, self.drafts[speaker], self.round)
+                    self.message_pool.append_message(message)
+                    self.recent.append(message)
+                self._end_round()
+        return TimeStep(observation=self.get_observation(), reward=self.get_rewards(), terminal=self.is_terminal())
+
+    def get_rewards(self) -> Dict[str, float]:
+        if not self.finished:
+            return self.get_zero_rewards()
+        return {player: float(self.consensus_option is not None) for player in self.player_names}
+
+    def is_terminal(self) -> bool:
+        return self.finished
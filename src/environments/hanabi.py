@@ -0,0 +1,285 @@
+import random
+import re
+from array import array
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from chatarena.environments import Environment, TimeStep, register_env
+from chatarena.message import Message, MessagePool
+
+from .base import PlayerObservations
+
+COLORS = ("red", "yellow", "green", "white", "blue")
+RANK_COPIES = (3, 2, 2, 2, 1)
+NUM_CARDS = len(COLORS) * len(RANK_COPIES)
+MAX_INFO_TOKENS = 8
+MAX_FUSE_TOKENS = 3
+MAX_SCORE = NUM_CARDS
+
+# A card is color * 5 + rank, with ranks 0-4 standing for 1-5
+CARD_COLOR = tuple(card // 5 for card in range(NUM_CARDS))
+CARD_RANK = tuple(card % 5 for card in range(NUM_CARDS))
+CARD_NAMES = tuple(f"{COLORS[CARD_COLOR[card]]} {CARD_RANK[card] + 1}" for card in range(NUM_CARDS))
+FULL_DECK = bytes(color * 5 + rank for color in range(5) for rank in range(5) for _ in range(RANK_COPIES[rank]))
+
+# What a player knows about one of their cards, from the hints so far: bits 0-4 are the colors it may be,
+# bits 5-9 the ranks. Hints only ever rule out whole colors or ranks, so these ten bits are exact.
+COLOR_BITS = tuple(1 << color for color in range(5))
+RANK_BITS = tuple(1 << (5 + rank) for rank in range(5))
+ALL_COLORS = sum(COLOR_BITS)
+ALL_RANKS = sum(RANK_BITS)
+UNKNOWN = ALL_COLORS | ALL_RANKS
+
+PLAY, DISCARD, HINT_COLOR, HINT_RANK = range(4)
+
+
+def _describe(knowledge: int) -> str:
+    colors = [COLORS[color] for color in range(5) if knowledge & COLOR_BITS[color]]
+    ranks = [str(rank + 1) for rank in range(5) if knowledge & RANK_BITS[rank]]
+    color = "any color" if len(colors) == 5 else " or ".join(colors)
+    rank = "any rank" if len(ranks) == 5 else " or ".join(ranks)
+    return f"{color}, {rank}"
+
+
+KNOWLEDGE_TEXT = tuple(_describe(knowledge) for knowledge in range(UNKNOWN + 1))
+
+
+def hand_size(num_players: int) -> int:
+    return 5 if num_players <= 3 else 4
+
+
+@lru_cache(maxsize=None)
+def move_table(num_players: int) -> Tuple[Tuple[int, int, int], ...]:
+    """Every move as (kind, slot or target offset, color or rank), indexed by move id.
+
+    Ids are laid out so they can be computed directly: plays are 0..H-1, discards H..2H-1, then ten hints
+    (five colors, five ranks) for each other player in turn order.
+    """
+    size = hand_size(num_players)
+    moves = [(PLAY, slot, 0) for slot in range(size)] + [(DISCARD, slot, 0) for slot in range(size)]
+    for offset in range(1, num_players):
+        moves += [(HINT_COLOR, offset, color) for color in range(5)] + [(HINT_RANK, offset, rank) for rank in range(5)]
+    return tuple(moves)
+
+
+class HanabiState:
+    """The whole game in a few byte and integer arrays, with no text, so scripted rollouts run fast.
+
+    `legal_moves` and `apply` work on the move ids of `move_table`; `copy` and `rollout` let a search or
+    a simulation continue from any state without touching the original.
+    """
+    __slots__ = ("num_players", "hand_size", "moves", "deck", "hands", "knowledge", "fireworks", "discards",
+                 "info_tokens", "fuse_tokens", "current", "turns_left")
+
+    def __init__(self, num_players: int, rng=random):
+        assert 2 <= num_players <= 5, f"Hanabi needs 2 to 5 players, not {num_players}"
+        self.num_players = num_players
+        self.hand_size = hand_size(num_players)
+        self.moves = move_table(num_players)
+        deck = bytearray(FULL_DECK)
+        rng.shuffle(deck)
+        self.deck = deck
+        self.hands = [bytearray() for _ in range(num_players)]
+        self.knowledge = [array("H") for _ in range(num_players)]
+        for _ in range(self.hand_size):
+            for player in range(num_players):
+                self._draw(player)
+        self.fireworks = bytearray(5)
+        self.discards = bytearray(NUM_CARDS)
+        self.info_tokens = MAX_INFO_TOKENS
+        self.fuse_tokens = MAX_FUSE_TOKENS
+        self.current = 0
+        # Moves left once the deck runs out; -1 until then
+        self.turns_left = -1
+
+    def copy(self) -> "HanabiState":
+        state = HanabiState.__new__(HanabiState)
+        state.num_players, state.hand_size, state.moves = self.num_players, self.hand_size, self.moves
+        state.deck, state.fireworks, state.discards = bytearray(self.deck), bytearray(self.fireworks), bytearray(self.discards)
+        state.hands = [bytearray(hand) for hand in self.hands]
+        state.knowledge = [array("H", knowledge) for knowledge in self.knowledge]
+        state.info_tokens, state.fuse_tokens = self.info_tokens, self.fuse_tokens
+        state.current, state.turns_left = self.current, self.turns_left
+        return state
+
+    @property
+    def score(self) -> int:
+        return sum(self.fireworks) if self.fuse_tokens else 0
+
+    def is_terminal(self) -> bool:
+        return self.fuse_tokens == 0 or self.turns_left == 0 or sum(self.fireworks) == MAX_SCORE
+
+    def _draw(self, player: int):
+        if self.deck:
+            self.hands[player].append(self.deck.pop())
+            self.knowledge[player].append(UNKNOWN)
+            if not self.deck:
+                # Everyone, including this player, gets one more turn
+                self.turns_left = self.num_players + 1
+
+    def legal_moves(self) -> List[int]:
+        hand_count = len(self.hands[self.current])
+        legal = list(range(hand_count))
+        if self.info_tokens < MAX_INFO_TOKENS:
+            legal += range(self.hand_size, self.hand_size + hand_count)
+        if self.info_tokens > 0:
+            for offset in range(1, self.num_players):
+                base = 2 * self.hand_size + 10 * (offset - 1)
+                colors = ranks = 0
+                for card in self.hands[(self.current + offset) % self.num_players]:
+                    colors |= COLOR_BITS[CARD_COLOR[card]]
+                    ranks |= 1 << CARD_RANK[card]
+                legal += [base + color for color in range(5) if colors & COLOR_BITS[color]]
+                legal += [base + 5 + rank for rank in range(5) if ranks >> rank & 1]
+        return legal
+
+    def apply(self, move: int) -> Optional[int]:
+        """Makes the move for the current player; returns the card played or discarded, if any."""
+        kind, argument, value = self.moves[move]
+        player = self.current
+        card = None
+        if kind == PLAY or kind == DISCARD:
+            card = self.hands[player].pop(argument)
+            self.knowledge[player].pop(argument)
+            color, rank = CARD_COLOR[card], CARD_RANK[card]
+            if kind == PLAY and self.fireworks[color] == rank:
+                self.fireworks[color] += 1
+                if rank == 4 and self.info_tokens < MAX_INFO_TOKENS:
+                    self.info_tokens += 1
+            else:
+                self.discards[card] += 1
+                if kind == PLAY:
+                    self.fuse_tokens -= 1
+                else:
+                    self.info_tokens += 1
+            self._draw(player)
+        else:
+            target = (player + argument) % self.num_players
+            knowledge = self.knowledge[target]
+            if kind == HINT_COLOR:
+                bit, matches = COLOR_BITS[value], [CARD_COLOR[card] == value for card in self.hands[target]]
+            else:
+                bit, matches = RANK_BITS[value], [CARD_RANK[card] == value for card in self.hands[target]]
+            mask = ALL_RANKS if kind == HINT_COLOR else ALL_COLORS
+            for slot, match in enumerate(matches):
+                knowledge[slot] &= (bit | mask) if match else ~bit
+            self.info_tokens -= 1
+        if self.turns_left > 0:
+            self.turns_left -= 1
+        self.current = (player + 1) % self.num_players
+        return card
+
+    def rollout(self, rng=random, max_moves: int = 1000) -> int:
+        """Plays uniformly random legal moves to the end of the game and returns the score."""
+        moves = 0
+        while not self.is_terminal() and moves < max_moves:
+            legal = self.legal_moves()
+            self.apply(legal[int(rng.random() * len(legal))])
+            moves += 1
+        return self.score
+
+
+@register_env
+class Hanabi(PlayerObservations, Environment):
+    """Cooperative Hanabi for 2 to 5 players on a `HanabiState`.
+
+    Players act in text, e.g. "play 2", "discard 1" or "hint Player 3 red"; the text of every move is
+    precomputed per seat, so checking an action is a dictionary lookup. Every player scores the final firework
+    total, which is 0 if the last fuse token burns.
+    """
+    type_name = "hanabi"
+
+    def __init__(self, player_names: List[str], **kwargs):
+        super().__init__(player_names=player_names, **kwargs)
+        self.message_pool = MessagePool()
+        num_players = len(self.player_names)
+        moves = move_table(num_players)
+        # Move text by seat, and the move id for each text
+        self.move_text: List[Tuple[str, ...]] = []
+        for seat in range(num_players):
+            texts = []
+            for kind, argument, value in moves:
+                if kind in (PLAY, DISCARD):
+                    texts.append(f"{'play' if kind == PLAY else 'discard'} {argument + 1}")
+                else:
+                    target = self.player_names[(seat + argument) % num_players]
+                    texts.append(f"hint {target} {COLORS[value] if kind == HINT_COLOR else value + 1}")
+            self.move_text.append(tuple(texts))
+        self.move_ids: List[Dict[str, int]] = [{text.lower(): move for move, text in enumerate(texts)} for texts in self.move_text]
+        names = "|".join(re.escape(name) for name in sorted(self.player_names, key=len, reverse=True))
+        self._move_pattern = re.compile(rf"\b(?:(play|discard)\s+(?:slot\s+|card\s+)?([1-5])|hint\s+({names})\s+(?:about\s+)?"
+                                        rf"({'|'.join(COLORS)}|[1-5])s?)\b", re.IGNORECASE)
+        self.reset()
+
+    def reset(self) -> TimeStep:
+        self.state = HanabiState(len(self.player_names))
+        self._reset_observations()
+        self._moderator_speak(f"Now the game starts! The players are {', '.join(self.player_names)}. You see everyone's cards "
+                              f"but your own. Together, build the five fireworks from 1 to 5 in each color.")
+        self._prompt_current_player()
+        return TimeStep(self.get_observation(), self.get_zero_rewards(), self.is_terminal())
+
+    def get_next_player(self) -> str:
+        return self.player_names[self.state.current]
+
+    def view(self, seat: int) -> str:
+        """What the player in `seat` sees: the others' cards and what they know, their own knowledge and the table."""
+        state = self.state
+        lines = [f"Fireworks: {', '.join(f'{COLORS[color]} {state.fireworks[color]}' for color in range(5))}. "
+                 f"Info tokens: {state.info_tokens}, fuse tokens: {state.fuse_tokens}, cards left in the deck: {len(state.deck)}."]
+        for offset in range(1, state.num_players):
+            other = (seat + offset) % state.num_players
+            cards = ", ".join(f"{CARD_NAMES[card]} (they know: {KNOWLEDGE_TEXT[knowledge]})"
+                              for card, knowledge in zip(state.hands[other], state.knowledge[other]))
+            lines.append(f"{self.player_names[other]}'s hand: {cards}.")
+        own = "; ".join(f"card {slot + 1}: {KNOWLEDGE_TEXT[knowledge]}" for slot, knowledge in enumerate(state.knowledge[seat]))
+        lines.append(f"Your hand: {own}.")
+        lines.append(f"Your legal moves: {'; '.join(self.move_text[seat][move] for move in state.legal_moves())}.")
+        return "\n".join(lines)
+
+    def _prompt_current_player(self):
+        player = self.get_next_player()
+        self._moderator_speak(f"{player}, it is your turn.\n{self.view(self.state.current)}", visible_to=[player])
+
+    def parse_move(self, action: str, player_name: str) -> Optional[int]:
+        """The move id of the last move named in `action`, or None."""
+        matches = list(self._move_pattern.finditer(action))
+        if not matches:
+            return None
+        verb, slot, target, value = matches[-1].groups()
+        text = f"{verb} {slot}" if verb else f"hint {target} {value}"
+        return self.move_ids[self.player_names.index(player_name)].get(text.lower())
+
+    def check_action(self, action: str, player_name: str) -> bool:
+        move = self.parse_move(action, player_name)
+        return move is not None and move in self.state.legal_moves()
+
+    def step(self, player_name: str, action: str) -> TimeStep:
+        assert player_name == self.get_next_player(), f"Wrong player! It is {self.get_next_player()} turn."
+        seat = self.state.current
+        move = self.parse_move(action, player_name)
+        self._add_message(Message(player_name, action, self._current_turn))
+        fuse_tokens = self.state.fuse_tokens
+        card = self.state.apply(move)
+        if card is None:
+            result = f"{player_name} gives the hint: {self.move_text[seat][move]}."
+        elif self.state.fuse_tokens < fuse_tokens:
+            result = f"{player_name} played {CARD_NAMES[card]}, which does not fit. A fuse token burns."
+        else:
+            verb = "played" if self.state.moves[move][0] == PLAY else "discarded"
+            result = f"{player_name} {verb} {CARD_NAMES[card]}."
+        self._current_turn += 1
+        if self.is_terminal():
+            self._moderator_speak(f"{result} The game is over with a score of {self.state.score}.")
+        else:
+            self._moderator_speak(result)
+            self._prompt_current_player()
+        return TimeStep(observation=self.get_observation(), reward=self.get_rewards(), terminal=self.is_terminal())
+
+    def get_rewards(self) -> Dict[str, float]:
+        if not self.is_terminal():
+            return self.get_zero_rewards()
+        return {player: float(self.state.score) for player in self.player_names}
+
+    def is_terminal(self) -> bool:
+        return self.state.is_terminal()
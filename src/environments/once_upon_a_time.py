@@ -2,7 +2,7 @@ import random
 import re
 from dataclasses import dataclass
 from enum import Enum
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 
 from chatarena.environments import Environment, register_env
 from chatarena.environments.base import TimeStep
@@ -246,14 +246,13 @@ def cards_used(action, cards) -> List[Card]:
 def used_ending(action, ending) -> bool:
     return action.lower().endswith(ending.lower())
 
-def valid_interrupt_card(action, cards, previous_story, previously_used_cards) -> Optional[Card]:
+def valid_interrupt_card(action, cards, previous_story, previously_used_cards, parser: Parser) -> Optional[Card]:
     story_elements = [e.lower() for e in re.findall(r'<b>(.*?)</b>', action)]
     story_elements = [e for e in story_elements if e in [c.text.lower() for c in cards]]
     if not story_elements:
         return None
     interrupting_card_text = story_elements[0]
     interrupting_card = [c for c in cards if c.text.lower() == interrupting_card_text.lower()][0]
-    parser = Parser()
     interrupt_answer = parser(f"There are two ways to interrupt:\n1. By using an interrupt card from your hand, and replacing a recently used story element with the new story element, and continuing the story from there. For example if someone uses the horse story element and you have the dragon interrupt card, you can say 'INTERRUPTION: No, it wasn't a horse, but a <b>dragon</b>, and the dragon...'\n2. By using a anything that was mentioned in the story, that appears on one of the cards in your hand (not necessarily an interrupt card). For example, if you have the house card and the storyteller mentioned a house, you can say: 'INTERRUPTION: You said house! It was in the <b>house</b> that...'\n\nWas this a valid interruption?\nStory: {previous_story}\nElements in Story: {previously_used_cards}\nInterrupting Card: {interrupting_card}\nAttempted Interruption: {action}\nSay only yes or no.")
     if 'yes' in interrupt_answer.lower():
         return interrupting_card
@@ -267,9 +266,10 @@ class GameMode(Enum):
 class OnceUponATime(Environment):
     type_name = "once_upon_a_time"
 
-    def __init__(self, player_names: List[str], **kwargs):
-        super().__init__(player_names, **kwargs)
+    def __init__(self, player_names: List[str], parser: Optional[dict] = None, **kwargs):
+        super().__init__(player_names, parser=parser, **kwargs)
         self.message_pool = MessagePool()
+        self.parser = Parser(**(parser or {}))
 
     def reset(self) -> TimeStep:
         self.deck = Deck()
@@ -317,6 +317,10 @@ class OnceUponATime(Environment):
         self.challenges = 0
         self.moderator_speaks(f"The interjection round is over, and {self.storyteller_name} is the storyteller again.")
 
+    def player_roles(self) -> Dict[str, str]:
+        """The first storyteller's seat apart from the others, for rating players per seat."""
+        return {player: "first storyteller" if index == 0 else "player" for index, player in enumerate(self.player_names)}
+
     @property
     def storyteller_name(self):
         return self.player_names[self.current_storyteller]
@@ -365,7 +369,7 @@ class OnceUponATime(Environment):
     def interject_step(self, player_name: str, action: str, action_type: ActionType) -> TimeStep:
         self.increment_player()
         if action_type == ActionType.INTERRUPT:
-            interrupt_card = valid_interrupt_card(action, self.hands[player_name].cards, self.last_story, self.last_story_cards)
+            interrupt_card = valid_interrupt_card(action, self.hands[player_name].cards, self.last_story, self.last_story_cards, self.parser)
             if interrupt_card is None:
                 self.moderator_speaks(f"{player_name} has the following cards available to interrupt: {self.hands[player_name].cards}", visible_to='Moderator')
                 self.message_pool.append_message(Message(player_name, f'{action}', self.message_pool.last_turn + 1, visible_to='moderator'))
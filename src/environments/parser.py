@@ -0,0 +1,121 @@
+import json
+import re
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from chatarena.backends import load_backend
+from chatarena.config import BackendConfig
+
+from ..backends import OpenAIChat
+from ..routing import escalated, is_escalated
+from .semantic_cache import SemanticCache, shared_cache
+
+# Parser calls currently waiting on a backend, by backend config and prompt, shared by every game in the process
+_in_flight: Dict[Tuple[str, str], Future] = {}
+_in_flight_lock = threading.Lock()
+NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+class Parser:
+    def __init__(self, backend: Optional[dict] = None, coalesce: bool = True, cache: Optional[dict] = None) -> None:
+        """`backend` is a backend config; any backend exposing `_get_response(messages)` works.
+
+        With `coalesce`, a prompt already in flight to an identically configured backend, e.g. the same judgment
+        in another concurrent game, waits for that call and shares its answer instead of making its own.
+        `cache` takes SemanticCache arguments (`{}` for the defaults) to reuse the answers of multiple-choice
+        judgments for paraphrased subjects. Free-form and numeric answers are never cached, since subjects that
+        embed alike, such as two contributions differing only in their number, may need different answers.
+        """
+        if backend:
+            self.backend = load_backend(BackendConfig(**backend))
+        else:
+            self.backend = OpenAIChat(temperature=0.0)
+        self.backend_key = json.dumps(backend or {}, sort_keys=True)
+        self.coalesce = coalesce
+        self.coalesced = 0
+        self.cache_config = cache
+        # Set by `apply_routing` when the policy has stronger settings to ask again with
+        self.escalation = False
+
+    @property
+    def cache(self) -> Optional[SemanticCache]:
+        return shared_cache(self.cache_config) if self.cache_config is not None else None
+
+    def _answer(self, prompt: str, choices: Union[List[str], Dict[str, str], None] = None,
+                subject: Optional[str] = None, hypothesis: Optional[str] = None) -> Any:
+        if choices and hasattr(self.backend, "classify"):
+            answer = self.backend.classify(prompt if subject is None else subject, choices, hypothesis)
+            if answer is not None:
+                return answer
+        messages = [
+            {"role": "system", "content": 'You are a helpful assistant'},
+            {"role": "user", "content": prompt}
+            ]
+        return self.backend._get_response(messages) # type: ignore
+
+    def _checked_answer(self, prompt: str, choices: Union[List[str], Dict[str, str], None] = None,
+                        subject: Optional[str] = None, hypothesis: Optional[str] = None, number: bool = False) -> Any:
+        """Asks again, escalated to the routing policy's stronger settings, if the answer names none of the choices,
+        or, with `number`, holds no number.
+
+        Without such settings another call would get the same answer, so the first one stands.
+        """
+        answer = self._answer(prompt, choices, subject, hypothesis)
+        if self.escalation and not is_escalated():
+            if choices:
+                labels = choices.values() if isinstance(choices, dict) else choices
+                unclear = not any(label.lower() in str(answer).lower() for label in labels)
+            else:
+                unclear = number and NUMBER.search(str(answer)) is None
+            if unclear:
+                with escalated():
+                    answer = self._answer(prompt, choices, subject, hypothesis)
+        return answer
+
+    def _get_response(self, prompt: str, choices: Union[List[str], Dict[str, str], None] = None,
+                      subject: Optional[str] = None, hypothesis: Optional[str] = None, number: bool = False) -> Any:
+        # An escalated question was answered unparseably before, so the cache would only repeat that answer
+        cache = self.cache if subject and choices and not is_escalated() else None
+        if cache is None:
+            return self._checked_answer(prompt, choices, subject, hypothesis, number)
+        template = f"{self.backend_key}\n{prompt.replace(subject, '{}')}"
+        embedding = cache.embed(subject)
+        cached, verify = cache.lookup(template, embedding)
+        if cached is not None and not verify:
+            return cached
+        answer = self._checked_answer(prompt, choices, subject, hypothesis)
+        cache.add(template, embedding, answer, expected=cached if verify else None)
+        return answer
+
+    def __call__(self, prompt: str, choices: Union[List[str], Dict[str, str], None] = None,
+                 subject: Optional[str] = None, hypothesis: Optional[str] = None, number: bool = False) -> Any:
+        """Answers `prompt`.
+
+        For a multiple-choice judgment, `choices` lists the possible answers (or maps candidate labels to them),
+        `subject` is the text being judged and `hypothesis` a template such as "This player chose to {}.".
+        Backends with a `classify` method, like `zero-shot-classifier`, can then answer without an LLM.
+        With `number`, the answer should hold a number, and is asked again, escalated, if it does not.
+        """
+        if not self.coalesce:
+            return self._get_response(prompt, choices, subject, hypothesis, number)
+        key = (self.backend_key, prompt)
+        with _in_flight_lock:
+            future = _in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = _in_flight[key] = Future()
+        if not leader:
+            self.coalesced += 1
+            return future.result()
+        try:
+            result = self._get_response(prompt, choices, subject, hypothesis, number)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with _in_flight_lock:
+                del _in_flight[key]
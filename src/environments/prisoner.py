@@ -1,47 +1,56 @@
-from collections import defaultdict
+import re
 from typing import Dict, List
 
+import numpy as np
 from chatarena.environments import register_env
 
-from .base import Parser, Round, SimpleRoundEnvironment
+from .base import Parser, SimpleRoundEnvironment, structured_decision
 
+DECISION = re.compile(r"DECISION:\W*(cooperate|defect)\b", re.IGNORECASE)
 
-def players_cooperated(round: Round) -> Dict[str, bool]:
-    parser = Parser()
-    cooperated = {}
-    for player, action in round.player_actions.items():
-        action = parser(f'Did this player cooperate or defect?\n>{action}\nSay only "cooperate" or "defect".')
-        cooperated[player] = 'cooperate' in action.lower()
-    return cooperated
 
+def player_cooperated(action: str, parser: Parser, structured: bool = False) -> bool:
+    decision = structured_decision(action, DECISION) if structured else None
+    if decision is not None:
+        return decision == 'cooperate'
+    answer = parser(f'Did this player cooperate or defect?\n>{action}\nSay only "cooperate" or "defect".',
+                    choices=["cooperate", "defect"], subject=action, hypothesis="This player chose to {}.")
+    return 'cooperate' in answer.lower()
 
-def player_scores(round: Round, payouts: Dict[str, Dict[str, int]]) -> Dict[str, float]:
-    assert round.is_complete
-    scores = {}
-    players_cooperated_in_round = players_cooperated(round)
-    cooperated_count = sum(1 for cooperated in players_cooperated_in_round.values() if cooperated)
 
-    for player, cooperated in players_cooperated_in_round.items():
-        if cooperated:
-            other_cooperated = cooperated_count - 1
-            score = payouts['cooperate'][f'{other_cooperated}_others_cooperate']
-        else:
-            other_cooperated = cooperated_count
-            score = payouts['defect'][f'{other_cooperated}_others_cooperate']
-        scores[player] = score
-    return scores
+def players_cooperated(actions: List[str], parser: Parser, structured: bool = False) -> np.ndarray:
+    """Whether each player cooperated, by player number."""
+    return np.array([player_cooperated(action, parser, structured) for action in actions], dtype=bool)
+
+
+def round_scores(cooperated: np.ndarray, payouts: Dict[str, Dict[str, int]]) -> np.ndarray:
+    """Each player's payout for the round, by player number."""
+    num_players = len(cooperated)
+    cooperated_count = int(cooperated.sum())
+    # Payouts for cooperating with k-1 other cooperators, and for defecting against k, for k cooperators in all
+    cooperate = payouts['cooperate'][f'{max(cooperated_count - 1, 0)}_others_cooperate']
+    defect = payouts['defect'][f'{cooperated_count}_others_cooperate'] if cooperated_count < num_players else 0
+    return np.where(cooperated, cooperate, defect).astype(float)
 
 
 @register_env
 class PrisonersDilemma(SimpleRoundEnvironment):
     type_name = "prisoner"
+    decision_instruction = 'End every decision with a line "DECISION: cooperate" or "DECISION: defect".'
 
     def __init__(self, player_names: List[str], payouts: Dict[str, Dict[str, int]], **kwargs):
         self.payouts = payouts
         super().__init__(player_names=player_names, **kwargs)
 
     def begin_game(self):
-        self._moderator_speak(f"The payout matrix is as follows: {self.payouts}")
+        if not self.large_n:
+            self._moderator_speak(f"The payout matrix is as follows: {self.payouts}")
+            return
+        others = range(len(self.player_names))
+        cooperate = ", ".join(str(self.payouts['cooperate'].get(f'{k}_others_cooperate', '-')) for k in others)
+        defect = ", ".join(str(self.payouts['defect'].get(f'{k}_others_cooperate', '-')) for k in others)
+        self._moderator_speak(f"Payouts when 0, 1, 2, ... of the other players cooperate: if you cooperate, {cooperate}; "
+                              f"if you defect, {defect}.")
 
     def begin_round(self) -> None:
         """
@@ -53,18 +62,20 @@ class PrisonersDilemma(SimpleRoundEnvironment):
             self._moderator_speak(f"You can look around others' decisions and think your decision for next round. Now let us move to next round")
 
     def complete_round(self) -> None:
+        cooperated = players_cooperated(self.current_round.actions, self.parser, self.structured_actions)
+        scores = round_scores(cooperated, self.payouts)
+        self.scores += scores
         self._moderator_speak(f"Round {len(self.rounds)} is over.")
-        self._moderator_speak("\n".join(
-            [
-                f"{player} said: {action}"
-                for player, action in self.current_round.player_actions.items()
-            ]
-        ))
-
-    def player_scores(self) -> Dict[str, float]:
-        total_scores = defaultdict(float)
-        for round in self.rounds:
-            scores = player_scores(round, self.payouts)
-            for player, score in scores.items():
-                total_scores[player] += score
-        return total_scores
\ No newline at end of file
+        if not self.large_n:
+            self._moderator_speak("\n".join(
+                [
+                    f"{player} said: {action}"
+                    for player, action in self.current_round.player_actions.items()
+                ]
+            ))
+            return
+        count = int(cooperated.sum())
+        self._moderator_speak(f"{count} of {len(cooperated)} players ({count / len(cooperated):.0%}) cooperated."
+                              + self.quotes(self.current_round))
+        self._tell_outcomes([f"In round {len(self.rounds)} you {'cooperated' if did_cooperate else 'defected'} and scored {score:g}; "
+                             f"your total is {total:g}." for did_cooperate, score, total in zip(cooperated, scores, self.scores)])
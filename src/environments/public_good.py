@@ -1,37 +1,51 @@
-from typing import Dict, List
+import logging
+import re
+from typing import List
 
+import numpy as np
 from chatarena.environments import register_env
 
-from .base import Parser, SimpleRoundEnvironment
+from .base import Parser, SimpleRoundEnvironment, distribution, structured_decision
+from .parser import NUMBER
 
+CONTRIBUTION = re.compile(r"CONTRIBUTE:\W*(\d+(?:\.\d+)?)", re.IGNORECASE)
 
-def calculate_contributions(player_actions: Dict[str, str]) -> Dict[str, float]:
-    parser = Parser()
-    contributions = {}
-    for player, action in player_actions.items():
-        action = parser(f'How many points did this player contribute?\n>{action}\nSay only a number.')
-        contributions[player] = float(action)
-    return contributions
 
-def updated_scores(scores: Dict[str, float], contributions: Dict[str, float], interest_multiplier: float) -> Dict[str, float]:
-    total_contributions = sum(contributions.values())
-    payback = total_contributions * interest_multiplier / len(scores)
-    for player in scores.keys():
-        scores[player] = scores[player] - contributions[player] + payback
-    return scores
+def player_contribution(action: str, parser: Parser, structured: bool = False) -> float:
+    decision = structured_decision(action, CONTRIBUTION) if structured else None
+    if decision is not None:
+        return float(decision)
+    prompt = f'How many points did this player contribute?\n>{action}\nSay only a number.'
+    answer = str(parser(prompt, subject=action, number=True))
+    match = NUMBER.search(answer)
+    if match is None:
+        logging.warning(f"No contribution in the Parser's answer {answer!r} for {action!r}, counting it as 0")
+        return 0.0
+    return float(match.group())
+
+
+def calculate_contributions(actions: List[str], parser: Parser, structured: bool = False) -> np.ndarray:
+    """Each player's contribution, by player number."""
+    return np.array([player_contribution(action, parser, structured) for action in actions])
+
+
+def updated_scores(scores: np.ndarray, contributions: np.ndarray, interest_multiplier: float) -> np.ndarray:
+    payback = contributions.sum() * interest_multiplier / len(scores)
+    return scores - contributions + payback
 
 
 @register_env
 class PublicGood(SimpleRoundEnvironment):
     type_name = "public_good"
+    decision_instruction = 'End every decision with a line "CONTRIBUTE: <points>", for example "CONTRIBUTE: 40".'
 
     def __init__(self, player_names: List[str], interest_multiplier: float, **kwargs):
         self.interest_multiplier = interest_multiplier
         self.starting_points = 100.0
-        self._player_scores = {player_name: self.starting_points for player_name in player_names}
         super().__init__(player_names=player_names, **kwargs)
 
     def begin_game(self):
+        self.scores[:] = self.starting_points
         self._moderator_speak(f"Each player has {self.starting_points} points at the beginning.")
 
     def begin_round(self) -> None:
@@ -45,15 +59,19 @@ class PublicGood(SimpleRoundEnvironment):
 
     def complete_round(self) -> None:
         self._moderator_speak(f"Round {len(self.rounds)} is over.")
-        self._moderator_speak("\n".join(
-            [
-                f"{player} said: {action}"
-                for player, action in self.current_round.player_actions.items()
-            ]
-        ))
-        contributions = calculate_contributions(self.current_round.player_actions)
-        self._player_scores = updated_scores(self._player_scores, contributions, self.interest_multiplier)
-        self._moderator_speak(f"Current scores: {self._player_scores}")
-
-    def player_scores(self) -> Dict[str, float]:
-        return self._player_scores
+        contributions = calculate_contributions(self.current_round.actions, self.parser, self.structured_actions)
+        self.scores = updated_scores(self.scores, contributions, self.interest_multiplier)
+        if not self.large_n:
+            self._moderator_speak("\n".join(
+                [
+                    f"{player} said: {action}"
+                    for player, action in self.current_round.player_actions.items()
+                ]
+            ))
+            self._moderator_speak(f"Current scores: {self.player_scores()}")
+            return
+        payback = contributions.sum() * self.interest_multiplier / len(contributions)
+        self._moderator_speak(f"Contributions: {distribution(contributions)}; {contributions.sum():g} in total, so everyone "
+                              f"gets {payback:g} points back. Scores: {distribution(self.scores)}." + self.quotes(self.current_round))
+        self._tell_outcomes([f"In round {len(self.rounds)} you contributed {contribution:g} and now have {score:g} points."
+                             for contribution, score in zip(contributions, self.scores)])
@@ -0,0 +1,130 @@
+import json
+import random
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Sentence-embedding models and caches, shared by every Parser in the process
+_models: Dict[str, Any] = {}
+_caches: Dict[str, "SemanticCache"] = {}
+_lock = threading.Lock()
+
+
+def embedding_model(name: str):
+    with _lock:
+        if name not in _models:
+            # Imported here, as sentence-transformers is slow to import and optional
+            from sentence_transformers import SentenceTransformer
+            _models[name] = SentenceTransformer(name, device="cpu")
+        return _models[name]
+
+
+def shared_cache(config: Dict[str, Any]) -> "SemanticCache":
+    """The process-wide cache for `config`, so concurrent games learn from each other's judgments."""
+    key = json.dumps(config, sort_keys=True)
+    with _lock:
+        if key not in _caches:
+            _caches[key] = SemanticCache(**config)
+        return _caches[key]
+
+
+class TemplateIndex:
+    """Normalized embeddings and answers of the subjects judged with one question template, evicted LRU."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.embeddings: Optional[np.ndarray] = None
+        self.answers: List[Any] = []
+        self.last_used = np.zeros(max_entries, dtype=np.int64)
+
+    def nearest(self, embedding: np.ndarray):
+        if not self.answers:
+            return None, -1.0
+        similarities = self.embeddings[:len(self.answers)] @ embedding
+        best = int(np.argmax(similarities))
+        return best, float(similarities[best])
+
+    def add(self, embedding: np.ndarray, answer: Any, clock: int) -> bool:
+        """Stores the answer; returns whether an older entry was evicted to make room."""
+        if self.embeddings is None:
+            self.embeddings = np.zeros((self.max_entries, embedding.shape[0]), dtype=np.float32)
+        if len(self.answers) < self.max_entries:
+            slot, evicted = len(self.answers), False
+            self.answers.append(answer)
+        else:
+            slot, evicted = int(np.argmin(self.last_used)), True
+            self.answers[slot] = answer
+        self.embeddings[slot] = embedding
+        self.last_used[slot] = clock
+        return evicted
+
+
+class SemanticCache:
+    """Reuses a Parser answer for a subject whose embedding is within `threshold` cosine similarity of one judged
+    before with the same question template.
+
+    A `verify_rate` share of hits is still sent to the backend, and the fraction of those where the cached answer
+    agreed (`stats()["precision"]`) shows whether the threshold is safe.
+    """
+
+    def __init__(self, model: str = "sentence-transformers/all-MiniLM-L6-v2", threshold: float = 0.92,
+                 verify_rate: float = 0.05, max_entries: int = 1000, seed: Optional[int] = None):
+        self.model = model
+        self.threshold = threshold
+        self.verify_rate = verify_rate
+        self.max_entries = max_entries
+        self.rng = random.Random(seed)
+        self.indexes: Dict[str, TemplateIndex] = {}
+        self.clock = 0
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.lookups = 0
+        self.hits = 0
+        self.verifications = 0
+        self.agreements = 0
+        self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "verifications": self.verifications,
+            "precision": self.agreements / self.verifications if self.verifications else None,
+            "evictions": self.evictions,
+            "entries": sum(len(index.answers) for index in self.indexes.values()),
+        }
+
+    def embed(self, text: str) -> np.ndarray:
+        return embedding_model(self.model).encode(text, normalize_embeddings=True).astype(np.float32)
+
+    def lookup(self, template: str, embedding: np.ndarray):
+        """Returns (answer, verify): the cached answer, or None on a miss, and whether to check it against the backend."""
+        with self._lock:
+            self.lookups += 1
+            self.clock += 1
+            index = self.indexes.get(template)
+            if index is None:
+                return None, False
+            best, similarity = index.nearest(embedding)
+            if similarity < self.threshold:
+                return None, False
+            index.last_used[best] = self.clock
+            if self.rng.random() < self.verify_rate:
+                return index.answers[best], True
+            self.hits += 1
+            return index.answers[best], False
+
+    def add(self, template: str, embedding: np.ndarray, answer: Any, expected: Any = None):
+        """Stores a backend answer; `expected` is the cached answer a verification compares it with."""
+        with self._lock:
+            if expected is not None:
+                self.verifications += 1
+                self.agreements += expected == answer
+                if expected == answer:
+                    return
+            index = self.indexes.setdefault(template, TemplateIndex(self.max_entries))
+            self.evictions += index.add(embedding, answer, self.clock)
@@ -22,6 +22,8 @@ class Undercover_Competition(Environment):
         self.topic_codes = topic_codes
 
         self.message_pool = MessagePool()
+        # Metric probe answers go to their own pool, so gameplay observations never scan them
+        self.metric_pool = MessagePool()
 
         # Topic setting
         self.undercover_code = None
@@ -89,6 +91,16 @@ class Undercover_Competition(Environment):
                 "is_pgm": message.is_pgm,
             }
             message_rows.append(message_row)
+
+        metric_rows = []
+        for message in self.get_metric_messages():
+            metric_rows.append({
+                "agent_name": message.agent_name,
+                "content": message.content,
+                "turn": message.turn,
+                "timestamp": str(message.timestamp),
+                "msg_type": message.msg_type,
+            })
         
         if not self.only_pgm_metric:
             assert self._win_group >= 0
@@ -109,6 +121,7 @@ class Undercover_Competition(Environment):
                 "game_setting": self.game_setting,
                 "player_backends": self.player_backends, 
                 "history": message_rows,
+                "metric_history": metric_rows,
                 "win_flag": self._win_group,
                 "result": result,
                 "player_vote": self._vote_of_each_player,
@@ -117,6 +130,12 @@ class Undercover_Competition(Environment):
                 }, 
                 f, indent=4)
 
+    def player_roles(self):
+        """
+        get the role of each player, for rating undercover and non-undercover play separately
+        """
+        return {name: "undercover" if name == self.undercover_name else "non-undercover" for name in self.player_names}
+
     def get_win_group(self):
         assert self._win_group >= 0
         return "non-undercover" if self._win_group == 0 else "undercover"
@@ -174,6 +193,7 @@ class Undercover_Competition(Environment):
         self.test_start = False
 
         self.message_pool.reset()
+        self.metric_pool.reset()
 
         self._moderator_speak(f"Now the game starts!")
         self._moderator_speak(f"Your word is: {self.undercover_code}",
@@ -210,6 +230,12 @@ class Undercover_Competition(Environment):
         else:
             return self.message_pool.get_visible_messages(player_name, turn=self._current_turn)
 
+    def get_metric_messages(self) -> List[Message]:
+        """
+        get the answers to the metric probes, which are kept out of the gameplay observations
+        """
+        return self.metric_pool.get_all_messages()
+
     def _text2vote(self, text) -> str:
         """
         convert text to vote, return a player's name
@@ -254,6 +280,14 @@ class Undercover_Competition(Environment):
         message = Message(agent_name="Moderator", content=text, turn=self._current_turn, visible_to=visible_to)
         self.message_pool.append_message(message)
 
+    def _record_metric(self, player_name: str, action: str, msg_type: str):
+        """
+        record a player's answer to a metric probe in the metric channel
+        """
+        message = Message(agent_name=player_name, content=action, turn=self._current_turn, is_show=False,
+                          is_consistency=msg_type == "metric_consistency", msg_type=msg_type)
+        self.metric_pool.append_message(message)
+
     def get_rewards(self, undercover_win: bool) -> Dict[str, float]:
         """
         get rewards for each player
@@ -476,8 +510,7 @@ class Undercover_Competition(Environment):
         
 
         elif self._current_phase == "metric_pgm":
-            message = Message(agent_name=player_name, content=action, turn=self._current_turn, is_show=False, msg_type="metric_pgm")
-            self.message_pool.append_message(message)
+            self._record_metric(player_name, action, "metric_pgm")
             self._current_turn += 1
             pgm_factor = self.parse_pgm(action)
             if self._metric_turn not in self.pgm_dict:
@@ -520,8 +553,7 @@ class Undercover_Competition(Environment):
                                 request_msg=request_msg)
 
         elif self._current_phase == "metric_consistency":
-            message = Message(agent_name=player_name, content=action, turn=self._current_turn, is_show=False, is_consistency=True, msg_type="metric_consistency")
-            self.message_pool.append_message(message)
+            self._record_metric(player_name, action, "metric_consistency")
             self._current_turn += 1
             consistency_flag = self.parse_consistency(action, self.player_names[self._next_player_idx], "undercover" if self._next_player_idx == self.undercover_idx else "non-undercover")
             if self._metric_turn not in self.consisteny_dict:
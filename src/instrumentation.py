@@ -0,0 +1,231 @@
+import contextvars
+import inspect
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .agents.react import ReActWrapper
+
+# Kind of the innermost instrumented call, so a backend completion knows what it was made for
+_caller: contextvars.ContextVar[str] = contextvars.ContextVar("caller", default="")
+# Label of a completion made directly by a player turn rather than by ReAct's reasoning step
+RESPONSE = "response"
+
+
+@dataclass
+class CallRecord:
+    kind: str  # "turn", "reasoning", "completion", "parser" or "environment"
+    caller: str  # for completions: "reasoning", "response" or "parser"
+    agent: str
+    phase: str
+    latency: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    retries: int = 0
+    error: Optional[str] = None
+
+
+def current_phase(environment) -> str:
+    """A short, low-cardinality label for what the environment is currently doing."""
+    for attribute in ("phase", "game_mode", "_current_phase"):
+        phase = getattr(environment, attribute, None)
+        if phase is not None:
+            return phase.name.lower() if hasattr(phase, "name") else str(phase)
+    if hasattr(environment, "rounds"):
+        return "round"
+    return "default"
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Instrumentation:
+    """Collects a CallRecord for every instrumented call of one game."""
+
+    def __init__(self, environment=None):
+        self.environment = environment
+        self.hedgers: Dict[str, Any] = {}  # Hedger of each hedged backend, by agent
+        self.reset()
+
+    def reset(self):
+        self.records: List[CallRecord] = []
+        for hedger in self.hedgers.values():
+            hedger.reset_stats()
+        self.started = time.perf_counter()
+
+    def _start(self, kind: str, backend) -> Tuple[Any, ...]:
+        caller = _caller.get()
+        if kind == "completion":
+            caller = RESPONSE if caller == "turn" else caller
+        token = _caller.set(kind)
+        phase = current_phase(self.environment) if self.environment is not None else "default"
+        return token, caller, phase, getattr(backend, "attempts", 0), getattr(backend, "last_usage", None), time.perf_counter()
+
+    def _finish(self, kind: str, agent: str, backend, started: Tuple[Any, ...], error: Optional[BaseException] = None):
+        token, caller, phase, attempts, usage, start = started
+        _caller.reset(token)
+        record = CallRecord(kind, caller if kind == "completion" else "", agent, phase, time.perf_counter() - start,
+                            error=type(error).__name__ if error else None)
+        if backend is not None:
+            record.retries = max(getattr(backend, "attempts", 0) - attempts - 1, 0)
+            new_usage = getattr(backend, "last_usage", None)
+            if new_usage is not None and new_usage is not usage and error is None:
+                record.prompt_tokens = new_usage.prompt_tokens
+                record.completion_tokens = new_usage.completion_tokens
+        self.records.append(record)
+
+    async def _finish_later(self, kind: str, agent: str, backend, started, awaitable):
+        try:
+            result = await awaitable
+        except Exception as e:
+            self._finish(kind, agent, backend, started, e)
+            raise
+        self._finish(kind, agent, backend, started)
+        return result
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-game totals by call kind; completions are split by what they were made for."""
+        groups: Dict[str, List[CallRecord]] = defaultdict(list)
+        for record in self.records:
+            groups[f"{record.kind}:{record.caller}" if record.caller else record.kind].append(record)
+        calls = {}
+        for key, records in groups.items():
+            latencies = [record.latency for record in records]
+            calls[key] = {
+                "count": len(records),
+                "latency_total": sum(latencies),
+                "latency_mean": sum(latencies) / len(latencies),
+                "latency_p50": percentile(latencies, 0.5),
+                "latency_p95": percentile(latencies, 0.95),
+                "prompt_tokens": sum(record.prompt_tokens for record in records),
+                "completion_tokens": sum(record.completion_tokens for record in records),
+                "retries": sum(record.retries for record in records),
+                "errors": sum(1 for record in records if record.error),
+            }
+        environment = calls.get("environment", {}).get("latency_total", 0.0)
+        parser = calls.get("parser", {}).get("latency_total", 0.0)
+        summary = {
+            "wall_time": time.perf_counter() - self.started,
+            "environment_time": environment - parser,  # environment code alone, without its Parser calls
+            "calls": calls,
+        }
+        cache = getattr(getattr(self.environment, "parser", None), "cache", None)
+        if cache is not None:
+            summary["parser_cache"] = cache.stats()  # process-wide, shared by every game
+        if self.hedgers:
+            summary["hedging"] = {agent: hedger.stats() for agent, hedger in self.hedgers.items()}
+        return summary
+
+    def to_openmetrics(self, prefix: str = "mutualism") -> str:
+        """Prometheus/OpenMetrics text exposition of the records, labelled by kind, caller, agent and phase."""
+        series: Dict[Tuple[str, ...], List[CallRecord]] = defaultdict(list)
+        for record in self.records:
+            series[(record.kind, record.caller, record.agent, record.phase)].append(record)
+
+        def labels(key: Tuple[str, ...]) -> str:
+            escaped = [value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in key]
+            return ",".join(f'{name}="{value}"' for name, value in zip(("kind", "caller", "agent", "phase"), escaped))
+
+        lines = [f"# TYPE {prefix}_call_latency_seconds summary", f"# HELP {prefix}_call_latency_seconds Latency of instrumented calls."]
+        for key, records in series.items():
+            lines.append(f"{prefix}_call_latency_seconds_count{{{labels(key)}}} {len(records)}")
+            lines.append(f"{prefix}_call_latency_seconds_sum{{{labels(key)}}} {sum(r.latency for r in records):.6f}")
+        for name, field, help_text in (
+            ("prompt_tokens", "prompt_tokens", "Prompt tokens reported by the backend."),
+            ("completion_tokens", "completion_tokens", "Completion tokens reported by the backend."),
+            ("retries", "retries", "Retried backend attempts."),
+        ):
+            lines += [f"# TYPE {prefix}_{name} counter", f"# HELP {prefix}_{name} {help_text}"]
+            for key, records in series.items():
+                if key[0] == "completion":
+                    lines.append(f"{prefix}_{name}_total{{{labels(key)}}} {sum(getattr(r, field) for r in records)}")
+        lines += [f"# TYPE {prefix}_call_errors counter", f"# HELP {prefix}_call_errors Instrumented calls that raised."]
+        for key, records in series.items():
+            lines.append(f"{prefix}_call_errors_total{{{labels(key)}}} {sum(1 for r in records if r.error)}")
+        for name, help_text in (("hedges", "Duplicate requests sent after the hedge delay."), ("hedge_wins", "Hedged requests answered by the duplicate.")):
+            if self.hedgers:
+                lines += [f"# TYPE {prefix}_{name} counter", f"# HELP {prefix}_{name} {help_text}"]
+            for agent, hedger in self.hedgers.items():
+                lines.append(f'{prefix}_{name}_total{{agent="{agent}"}} {getattr(hedger, name)}')
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+class Timed:
+    """Drop-in replacement for a function (sync or async) that records a CallRecord per call.
+
+    A callable object rather than a closure, so instrumented arenas can still be checkpointed.
+    """
+
+    def __init__(self, instrumentation: Instrumentation, function, kind: str, agent: str, backend=None):
+        self.instrumentation = instrumentation
+        self.function = function
+        self.kind = kind
+        self.agent = agent
+        self.backend = backend
+
+    def __call__(self, *args, **kwargs):
+        started = self.instrumentation._start(self.kind, self.backend)
+        try:
+            result = self.function(*args, **kwargs)
+        except Exception as e:
+            self.instrumentation._finish(self.kind, self.agent, self.backend, started, e)
+            raise
+        if inspect.isawaitable(result):
+            return self.instrumentation._finish_later(self.kind, self.agent, self.backend, started, result)
+        self.instrumentation._finish(self.kind, self.agent, self.backend, started)
+        return result
+
+
+class TimedParser:
+    """Wraps a Parser so each judgment is recorded; everything else is delegated to the Parser."""
+
+    def __init__(self, instrumentation: Instrumentation, parser):
+        self._parser = parser
+        self._call = Timed(instrumentation, parser.__call__, "parser", "Parser")
+
+    def __call__(self, *args, **kwargs):
+        return self._call(*args, **kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith("__") or name in ("_parser", "_call"):
+            raise AttributeError(name)
+        return getattr(self._parser, name)
+
+
+def instrument_completions(instrumentation: Instrumentation, backend, agent: str) -> None:
+    if getattr(backend, "hedger", None) is not None:
+        instrumentation.hedgers[agent] = backend.hedger
+        backend.hedger.reset_stats()
+    for method in ("_get_response", "_async_get_response"):
+        if hasattr(backend, method):
+            setattr(backend, method, Timed(instrumentation, getattr(backend, method), "completion", agent, backend))
+
+
+def instrument(arena) -> Instrumentation:
+    """Records player turns, ReAct reasoning calls, backend completions, Parser calls and environment steps.
+
+    The Instrumentation is also kept as `arena.instrumentation`, so it survives checkpoints.
+    """
+    environment = arena.environment
+    instrumentation = Instrumentation(environment)
+    for player in arena.players:
+        backend = player.backend
+        backend.query = Timed(instrumentation, backend.query, "turn", player.name)
+        backend.async_query = Timed(instrumentation, backend.async_query, "turn", player.name)
+        if isinstance(backend, ReActWrapper):
+            backend.get_reasoning = Timed(instrumentation, backend.get_reasoning, "reasoning", player.name)
+            backend = backend._backend
+        instrument_completions(instrumentation, backend, player.name)
+    parser = getattr(environment, "parser", None)
+    if parser is not None:
+        instrument_completions(instrumentation, parser.backend, "Parser")
+        environment.parser = TimedParser(instrumentation, parser)
+    environment.step = Timed(instrumentation, environment.step, "environment", "Moderator")
+    arena.instrumentation = instrumentation
+    return instrumentation
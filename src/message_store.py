@@ -0,0 +1,201 @@
+import json
+import tempfile
+import threading
+import zlib
+from collections.abc import Sequence
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from chatarena.message import Message, MessagePool
+
+
+class MessageRecord:
+    """The metadata of a spilled message; its content sits in a compressed batch of the segment."""
+    __slots__ = ("index", "agent_name", "turn", "timestamp", "visible_to", "msg_type", "logged", "batch", "position")
+
+    def __init__(self, index: int, message: Message, batch: int, position: int):
+        self.index = index
+        self.agent_name = message.agent_name
+        self.turn = message.turn
+        self.timestamp = message.timestamp
+        self.visible_to = message.visible_to
+        self.msg_type = message.msg_type
+        self.logged = message.logged
+        self.batch = batch
+        self.position = position
+
+    def message(self, content: str) -> Message:
+        return Message(self.agent_name, content, self.turn, self.timestamp, self.visible_to, self.msg_type, self.logged)
+
+
+class MessageHistory(Sequence):
+    """Every message of a MessageStore in order, read back from the segment only when iterated or indexed."""
+
+    def __init__(self, store: 'MessageStore'):
+        self.store = store
+
+    def __len__(self) -> int:
+        return len(self.store._records) + len(self.store._messages)
+
+    def __iter__(self) -> Iterator[Message]:
+        return iter(self.store.history())
+
+    def __getitem__(self, item):
+        return self.store.history()[item]
+
+
+class MessageStore(MessagePool):
+    """A MessagePool that keeps long games and many multiplexed games at a flat memory footprint.
+
+    Appended messages share one copy of every repeated content, name and visibility list. Once more than
+    `max_live` messages are in memory, those no player can observe any more are spilled to a temporary on-disk
+    segment, in zlib-compressed batches so near-identical moderator texts cost little there either; only a slotted
+    MessageRecord per message stays in memory. A message is no longer observable when none of `players` is among
+    its `visible_to`, like logged ReAct reasoning, or when it is more than `horizon` turns old, for environments
+    whose players only see recent turns. Messages of the latest turn are never spilled, since a streamed reasoning
+    message is still being written. `get_all_messages` still returns the whole game, for histories and logs.
+    """
+
+    def __init__(self, max_live: int = 1000, horizon: Optional[int] = None, players: Optional[List[str]] = None,
+                 spill_dir: Optional[str] = None):
+        super().__init__()
+        self.max_live = max_live
+        self.horizon = horizon
+        self.players = players
+        self.spill_dir = spill_dir
+        # ReAct players log their reasoning from the arena's threads
+        self._lock = threading.Lock()
+        self._segment = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._messages: List[Message] = []
+            self._indices: List[int] = []
+            self._records: List[MessageRecord] = []
+            self._batches: List[Tuple[int, int]] = []
+            self._strings: Dict[str, str] = {}
+            self._visibility: Dict[tuple, list] = {}
+            self._appended = 0
+            self._next_spill = self.max_live
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+
+    def _intern(self, text):
+        return self._strings.setdefault(text, text) if isinstance(text, str) else text
+
+    def append_message(self, message: Message):
+        with self._lock:
+            message.agent_name = self._intern(message.agent_name)
+            message.content = self._intern(message.content)
+            message.msg_type = self._intern(message.msg_type)
+            if isinstance(message.visible_to, list):
+                message.visible_to = self._visibility.setdefault(tuple(message.visible_to), message.visible_to)
+            else:
+                message.visible_to = self._intern(message.visible_to)
+            self._messages.append(message)
+            self._indices.append(self._appended)
+            self._appended += 1
+            if len(self._messages) > self._next_spill:
+                self._spill()
+
+    def observable(self, message: Message, cutoff: Optional[int]) -> bool:
+        """Whether a player may still observe `message`."""
+        if cutoff is not None and message.turn < cutoff:
+            return False
+        if message.visible_to == "all" or self.players is None:
+            return bool(message.visible_to)
+        return any(player in message.visible_to for player in self.players)
+
+    def spill(self):
+        with self._lock:
+            self._spill()
+
+    def _spill(self):
+        latest = self._messages[-1].turn
+        cutoff = latest - self.horizon if self.horizon is not None else None
+        keep, keep_indices, spilled = [], [], []
+        for index, message in zip(self._indices, self._messages):
+            if message.turn == latest or self.observable(message, cutoff):
+                keep.append(message)
+                keep_indices.append(index)
+            else:
+                spilled.append((index, message))
+        if spilled:
+            self._write_batch(spilled)
+            self._messages, self._indices = keep, keep_indices
+            # Content spilled to disk no longer needs an in-memory copy
+            self._strings = {name: name for name in (self.players or [])}
+            for message in keep:
+                self._intern(message.agent_name)
+                self._intern(message.content)
+                self._intern(message.msg_type)
+        # Observable messages are not rescanned until enough new ones arrive
+        self._next_spill = max(self.max_live, len(self._messages) + self.max_live // 4)
+
+    def _write_batch(self, spilled: List[Tuple[int, Message]]):
+        if self._segment is None:
+            self._segment = tempfile.TemporaryFile(dir=self.spill_dir)
+        data = zlib.compress(json.dumps([message.content for _, message in spilled]).encode())
+        offset = self._segment.seek(0, 2)
+        self._segment.write(data)
+        batch = len(self._batches)
+        self._batches.append((offset, len(data)))
+        self._records += [MessageRecord(index, message, batch, position) for position, (index, message) in enumerate(spilled)]
+
+    def _read_batch(self, batch: int) -> List[str]:
+        offset, length = self._batches[batch]
+        self._segment.seek(offset)
+        return json.loads(zlib.decompress(self._segment.read(length)))
+
+    def history(self) -> List[Message]:
+        """Every message of the game in the order appended, the spilled ones read back from the segment."""
+        with self._lock:
+            contents: Dict[int, List[str]] = {}
+            spilled = []
+            for record in self._records:
+                if record.batch not in contents:
+                    contents[record.batch] = self._read_batch(record.batch)
+                spilled.append((record.index, record.message(contents[record.batch][record.position])))
+            live = list(zip(self._indices, self._messages))
+        spilled.sort(key=lambda item: item[0])
+        merged, i = [], 0
+        for index, message in live:
+            while i < len(spilled) and spilled[i][0] < index:
+                merged.append(spilled[i][1])
+                i += 1
+            merged.append(message)
+        merged += [message for _, message in spilled[i:]]
+        return merged
+
+    def get_all_messages(self) -> MessageHistory:
+        return MessageHistory(self)
+
+    def __getstate__(self):
+        # Checkpoints carry the segment's bytes rather than its file handle
+        state = self.__dict__.copy()
+        state.pop("_lock")
+        if self._segment is not None:
+            self._segment.seek(0)
+            state["_segment"] = self._segment.read()
+        return state
+
+    def __setstate__(self, state):
+        segment = state.pop("_segment")
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._segment = None
+        if segment is not None:
+            self._segment = tempfile.TemporaryFile(dir=self.spill_dir)
+            self._segment.write(segment)
+
+
+def apply_message_store(arena, store: MessageStore) -> MessageStore:
+    """Moves the messages of the arena's environment into `store`, which becomes its message pool."""
+    environment = arena.environment
+    if store.players is None:
+        store.players = list(environment.player_names)
+    for message in environment.message_pool.get_all_messages():
+        store.append_message(message)
+    environment.message_pool = store
+    return store
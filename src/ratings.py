@@ -0,0 +1,126 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .agents.react import ReActWrapper
+
+# TrueSkill's defaults: prior mean and deviation, performance noise and per-game drift
+MU = 25.0
+SIGMA = MU / 3
+BETA = SIGMA / 2
+TAU = SIGMA / 100
+# Floor of the factor a deviation shrinks by in one game
+KAPPA = 1e-4
+
+
+def competitor_name(backend) -> str:
+    """What a player's ratings are kept under: its backend type and model, and the prompting wrapper around it."""
+    if isinstance(backend, ReActWrapper):
+        return f"react({competitor_name(backend._backend)})"
+    model = getattr(backend, "model", None)
+    return f"{backend.type_name}:{model}" if model else backend.type_name
+
+
+def player_info(arena) -> Dict[str, Dict[str, Optional[str]]]:
+    """Each player's competitor and, for environments with `player_roles()`, role, as stored with the game."""
+    player_roles = getattr(arena.environment, "player_roles", None)
+    roles = player_roles() if player_roles else {}
+    return {player.name: {"competitor": competitor_name(player.backend), "role": roles.get(player.name)} for player in arena.players}
+
+
+class Rating:
+    __slots__ = ("mu", "sigma", "games")
+
+    def __init__(self, mu: float = MU, sigma: float = SIGMA, games: int = 0):
+        self.mu = mu
+        self.sigma = sigma
+        self.games = games
+
+    @property
+    def conservative(self) -> float:
+        """A rating the competitor is very likely above, for ranking competitors with few games fairly."""
+        return self.mu - 3 * self.sigma
+
+
+class SkillRatings:
+    """TrueSkill-style ratings of each competitor in each role, updated one finished game at a time.
+
+    A game ranks its seats by reward and moves every seat's rating by its pairwise comparisons with the others,
+    by the Weng-Lin Bradley-Terry update, computed for all pairs at once. Ratings are kept per (competitor, role),
+    so an undercover and a civilian, or the first storyteller and the others, are rated separately. Seats played
+    by the same competitor in the same role are not compared with each other, and share the average of their updates.
+    """
+
+    def __init__(self, mu: float = MU, sigma: float = SIGMA, beta: float = BETA, tau: float = TAU):
+        self.mu = mu
+        self.sigma = sigma
+        self.beta = beta
+        self.tau = tau
+        self.ratings: Dict[Tuple[str, str], Rating] = {}
+        self.last_game_id = 0
+
+    def rating(self, competitor: str, role: Optional[str] = None) -> Rating:
+        key = (competitor, role or "")
+        if key not in self.ratings:
+            self.ratings[key] = Rating(self.mu, self.sigma)
+        return self.ratings[key]
+
+    def update(self, rewards: Dict[str, float], players: Dict[str, Dict[str, Optional[str]]]) -> bool:
+        """Folds in one game; games whose seats all tie, e.g. when nobody won, carry no ranking and are skipped."""
+        seats = [player for player in rewards if player in players]
+        scores = np.array([rewards[player] for player in seats], dtype=float)
+        if len(seats) < 2 or np.all(scores == scores[0]):
+            return False
+        keys = [(players[player]["competitor"], players[player].get("role") or "") for player in seats]
+        ratings = [self.rating(*key) for key in keys]
+        mu = np.array([rating.mu for rating in ratings])
+        variance = np.array([rating.sigma for rating in ratings]) ** 2 + self.tau ** 2
+        # Row i, column q: seat i against seat q
+        c = np.sqrt(variance[:, None] + variance[None, :] + 2 * self.beta ** 2)
+        p = 1 / (1 + np.exp((mu[None, :] - mu[:, None]) / c))
+        outcome = (scores[:, None] > scores[None, :]) + 0.5 * (scores[:, None] == scores[None, :])
+        key_ids = np.unique(np.array([f"{competitor}\0{role}" for competitor, role in keys]), return_inverse=True)[1]
+        compared = key_ids[:, None] != key_ids[None, :]
+        omega = (variance[:, None] / c * (outcome - p) * compared).sum(axis=1)
+        delta = (np.sqrt(variance)[:, None] / c * variance[:, None] / c ** 2 * p * (1 - p) * compared).sum(axis=1)
+        new_mu = mu + omega
+        new_variance = variance * np.maximum(1 - delta, KAPPA)
+        for key_id in np.unique(key_ids):
+            seats_of_key = key_ids == key_id
+            rating = ratings[int(np.argmax(seats_of_key))]
+            rating.mu = float(new_mu[seats_of_key].mean())
+            rating.sigma = float(np.sqrt(new_variance[seats_of_key].mean()))
+            rating.games += 1
+        return True
+
+    def leaderboard(self) -> List[Dict[str, Any]]:
+        """Every rated competitor and role, best conservative rating first."""
+        rows = [{"competitor": competitor, "role": role or None, "mu": rating.mu, "sigma": rating.sigma,
+                 "rating": rating.conservative, "games": rating.games}
+                for (competitor, role), rating in self.ratings.items()]
+        return sorted(rows, key=lambda row: row["rating"], reverse=True)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"mu": self.mu, "sigma": self.sigma, "beta": self.beta, "tau": self.tau, "last_game_id": self.last_game_id,
+                "ratings": [[competitor, role, rating.mu, rating.sigma, rating.games] for (competitor, role), rating in self.ratings.items()]}
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> 'SkillRatings':
+        ratings = cls(state["mu"], state["sigma"], state["beta"], state["tau"])
+        ratings.last_game_id = state["last_game_id"]
+        for competitor, role, mu, sigma, games in state["ratings"]:
+            ratings.ratings[(competitor, role)] = Rating(mu, sigma, games)
+        return ratings
+
+
+def bootstrap_intervals(wins: np.ndarray, games: int, samples: int = 2000, confidence: float = 0.95,
+                        seed: Optional[int] = 0) -> np.ndarray:
+    """Percentile bootstrap intervals of win rates, one row of (low, high) per entry of `wins`.
+
+    Resampling `games` games with replacement makes each win count binomial, so every player's resamples are
+    drawn in one vectorized call instead of materializing resampled games.
+    """
+    rates = np.asarray(wins, dtype=float) / games
+    draws = np.random.default_rng(seed).binomial(games, rates, size=(samples, len(rates))) / games
+    tail = (1 - confidence) / 2
+    return np.quantile(draws, [tail, 1 - tail], axis=0).T
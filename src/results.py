@@ -0,0 +1,136 @@
+import json
+import sqlite3
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from .ratings import SkillRatings, bootstrap_intervals
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    config TEXT NOT NULL,
+    seed INTEGER,
+    steps INTEGER,
+    terminal INTEGER,
+    duration REAL,
+    error TEXT,
+    rewards TEXT,
+    history TEXT,
+    metrics TEXT,
+    created REAL,
+    players TEXT
+)
+"""
+RATINGS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ratings (
+    name TEXT PRIMARY KEY,
+    state TEXT
+)
+"""
+
+
+def winners(rewards: Dict[str, float]) -> List[str]:
+    """Players with the highest reward; nobody wins a game where every reward is zero."""
+    if not rewards or not any(rewards.values()):
+        return []
+    best = max(rewards.values())
+    return [player for player, reward in rewards.items() if reward == best]
+
+
+class ResultsStore:
+    """SQLite store of finished games, shared by every config in a batch.
+
+    Win counts and skill ratings are updated with only the games added since they were last computed: win
+    counts for as long as the store is open, and ratings across batches, as their state is stored alongside.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute(SCHEMA)
+        self.connection.execute(RATINGS_SCHEMA)
+        # Stores written before players were recorded
+        if "players" not in {column[1] for column in self.connection.execute("PRAGMA table_info(games)")}:
+            self.connection.execute("ALTER TABLE games ADD COLUMN players TEXT")
+        self.connection.commit()
+        self._summary: Dict[str, Dict[str, Any]] = defaultdict(lambda: {"games": 0, "errors": 0, "unfinished": 0, "wins": defaultdict(int)})
+        self._summarized_id = 0
+
+    def add_game(self, config: str, seed: Optional[int], steps: int, terminal: bool, duration: float,
+                 rewards: Optional[Dict[str, float]], history: List[Dict[str, Any]], error: Optional[str] = None,
+                 metrics: Optional[Dict[str, Any]] = None, players: Optional[Dict[str, Dict[str, Optional[str]]]] = None) -> int:
+        cursor = self.connection.execute(
+            "INSERT INTO games (config, seed, steps, terminal, duration, error, rewards, history, metrics, created, players) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (config, seed, steps, int(terminal), duration, error, json.dumps(rewards), json.dumps(history), json.dumps(metrics), time.time(),
+             json.dumps(players)),
+        )
+        self.connection.commit()
+        return cursor.lastrowid
+
+    def games(self, config: Optional[str] = None, after_id: int = 0) -> Iterator[Dict[str, Any]]:
+        query = "SELECT id, config, seed, steps, terminal, duration, error, rewards, players FROM games WHERE id > ?"
+        params: List[Any] = [after_id]
+        if config is not None:
+            query += " AND config = ?"
+            params.append(config)
+        for row in self.connection.execute(query + " ORDER BY id", params):
+            game_id, config_name, seed, steps, terminal, duration, error, rewards, players = row
+            yield {"id": game_id, "config": config_name, "seed": seed, "steps": steps, "terminal": bool(terminal),
+                   "duration": duration, "error": error, "rewards": json.loads(rewards), "players": json.loads(players or "null")}
+
+    def history(self, game_id: int) -> List[Dict[str, Any]]:
+        row = self.connection.execute("SELECT history FROM games WHERE id = ?", (game_id,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def metrics(self, game_id: int) -> Optional[Dict[str, Any]]:
+        """The game's instrumentation summary."""
+        row = self.connection.execute("SELECT metrics FROM games WHERE id = ?", (game_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def win_rates(self, confidence: float = 0.95, samples: int = 2000) -> Dict[str, Dict[str, Any]]:
+        """Per config: number of finished games, errors, each player's share of wins and its bootstrap interval."""
+        summary = self._summary
+        for game in self.games(after_id=self._summarized_id):
+            self._summarized_id = game["id"]
+            stats = summary[game["config"]]
+            if game["error"]:
+                stats["errors"] += 1
+                continue
+            if not game["terminal"]:
+                stats["unfinished"] += 1
+                continue
+            stats["games"] += 1
+            for player in game["rewards"]:
+                stats["wins"][player] += 0
+            for player in winners(game["rewards"]):
+                stats["wins"][player] += 1
+        return {config: {**stats, "wins": dict(stats["wins"]), **self._rates(stats, confidence, samples)} for config, stats in summary.items()}
+
+    @staticmethod
+    def _rates(stats: Dict[str, Any], confidence: float, samples: int) -> Dict[str, Dict[str, Any]]:
+        if not stats["games"]:
+            return {"win_rates": {}, "win_rate_intervals": {}}
+        players = list(stats["wins"])
+        wins = np.array([stats["wins"][player] for player in players])
+        intervals = bootstrap_intervals(wins, stats["games"], samples, confidence)
+        return {"win_rates": {player: count / stats["games"] for player, count in zip(players, wins.tolist())},
+                "win_rate_intervals": {player: interval for player, interval in zip(players, intervals.tolist())}}
+
+    def ratings(self, name: str = "skill") -> SkillRatings:
+        """The skill ratings stored under `name`, first updated with every game finished since they were stored."""
+        row = self.connection.execute("SELECT state FROM ratings WHERE name = ?", (name,)).fetchone()
+        ratings = SkillRatings.from_dict(json.loads(row[0])) if row else SkillRatings()
+        for game in self.games(after_id=ratings.last_game_id):
+            ratings.last_game_id = game["id"]
+            if game["error"] or not game["terminal"] or not game["players"] or not winners(game["rewards"]):
+                continue
+            ratings.update(game["rewards"], game["players"])
+        self.connection.execute("INSERT OR REPLACE INTO ratings (name, state) VALUES (?, ?)", (name, json.dumps(ratings.to_dict())))
+        self.connection.commit()
+        return ratings
+
+    def close(self):
+        self.connection.close()
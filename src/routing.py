@@ -0,0 +1,144 @@
+import contextlib
+import contextvars
+import inspect
+from typing import Any, Dict, List, Optional
+
+from .agents.react import ReActWrapper
+from .instrumentation import current_phase
+
+# What the completion in progress is for: "response", "reasoning" or "parser"
+_call: contextvars.ContextVar[str] = contextvars.ContextVar("call", default="response")
+# Set while an answer that could not be parsed is asked again
+_escalated: contextvars.ContextVar[bool] = contextvars.ContextVar("escalated", default=False)
+
+ROUTED_SETTINGS = ("model", "max_tokens", "temperature")
+
+
+def is_escalated() -> bool:
+    return _escalated.get()
+
+
+@contextlib.contextmanager
+def escalated():
+    """Completions made in this block use the routing policy's `escalate` settings."""
+    token = _escalated.set(True)
+    try:
+        yield
+    finally:
+        _escalated.reset(token)
+
+
+class RoutingPolicy:
+    """Picks backend settings per call from the arena config's "routing" section, e.g.
+
+        {"rules": [{"call": "parser", "model": "gpt-3.5-turbo", "max_tokens": 10},
+                   {"phase": "interjection", "call": "response", "model": "gpt-3.5-turbo"},
+                   {"agent": "Player 1", "model": "gpt-4-1106-preview"}],
+         "escalate": {"model": "gpt-4-1106-preview"}}
+
+    The first rule whose "call", "phase" and "agent" (each optional) all match applies; a call no rule matches
+    keeps the backend's own settings. Calls are "reasoning" or "response" for players and "parser" for the Parser;
+    phases are those reported by `current_phase`. `max_tokens` only ever lowers the backend's current limit,
+    so a token budget still applies. `escalate` settings replace the routed ones when an answer is asked again
+    because it could not be parsed.
+    """
+
+    def __init__(self, rules: Optional[List[Dict[str, Any]]] = None, escalate: Optional[Dict[str, Any]] = None):
+        self.rules = rules or []
+        self.escalate = escalate or {}
+
+    def route(self, call: str, phase: str, agent: str) -> Dict[str, Any]:
+        if _escalated.get() and self.escalate:
+            return {key: value for key, value in self.escalate.items() if key in ROUTED_SETTINGS}
+        for rule in self.rules:
+            if all(rule.get(key) in (None, value) for key, value in (("call", call), ("phase", phase), ("agent", agent))):
+                return {key: value for key, value in rule.items() if key in ROUTED_SETTINGS}
+        return {}
+
+
+class RoutedCompletion:
+    """Replaces a backend's completion method: applies the routed settings for the call and restores them after."""
+
+    def __init__(self, policy: RoutingPolicy, environment, backend, function, agent: str, call: Optional[str] = None):
+        self.policy = policy
+        self.environment = environment
+        self.backend = backend
+        self.function = function
+        self.agent = agent
+        self.call = call
+
+    def _apply(self) -> Dict[str, Any]:
+        settings = self.policy.route(self.call or _call.get(), current_phase(self.environment), self.agent)
+        if "max_tokens" in settings and getattr(self.backend, "max_tokens", None) is not None:
+            settings["max_tokens"] = min(settings["max_tokens"], self.backend.max_tokens)
+        previous = {key: getattr(self.backend, key) for key in settings if hasattr(self.backend, key)}
+        for key, value in settings.items():
+            setattr(self.backend, key, value)
+        return previous
+
+    def _restore(self, previous: Dict[str, Any]):
+        for key, value in previous.items():
+            setattr(self.backend, key, value)
+
+    def __call__(self, *args, **kwargs):
+        previous = self._apply()
+        try:
+            return self.function(*args, **kwargs)
+        finally:
+            self._restore(previous)
+
+
+class AsyncRoutedCompletion(RoutedCompletion):
+    async def __call__(self, *args, **kwargs):
+        previous = self._apply()
+        try:
+            return await self.function(*args, **kwargs)
+        finally:
+            self._restore(previous)
+
+
+class Reasoning:
+    """Replaces ReActWrapper.get_reasoning so the completions it makes are routed as "reasoning"."""
+
+    def __init__(self, function):
+        self.function = function
+
+    async def _await(self, awaitable):
+        token = _call.set("reasoning")
+        try:
+            return await awaitable
+        finally:
+            _call.reset(token)
+
+    def __call__(self, *args, **kwargs):
+        token = _call.set("reasoning")
+        try:
+            result = self.function(*args, **kwargs)
+        finally:
+            _call.reset(token)
+        return self._await(result) if inspect.isawaitable(result) else result
+
+
+def route_completions(policy: RoutingPolicy, environment, backend, agent: str, call: Optional[str] = None) -> None:
+    if hasattr(backend, "_get_response"):
+        backend._get_response = RoutedCompletion(policy, environment, backend, backend._get_response, agent, call)
+    if hasattr(backend, "_async_get_response"):
+        backend._async_get_response = AsyncRoutedCompletion(policy, environment, backend, backend._async_get_response, agent, call)
+
+
+def apply_routing(arena, policy: RoutingPolicy) -> RoutingPolicy:
+    """Routes every player and Parser completion of the arena with `policy`, kept as `arena.routing`."""
+    environment = arena.environment
+    for player in arena.players:
+        backend = player.backend
+        if isinstance(backend, ReActWrapper):
+            backend.get_reasoning = Reasoning(backend.get_reasoning)
+            backend = backend._backend
+        route_completions(policy, environment, backend, player.name)
+    parser = getattr(environment, "parser", None)
+    if parser is not None:
+        # A classifier's own model is local; route the LLM it falls back to
+        route_completions(policy, environment, getattr(parser.backend, "fallback", parser.backend), "Parser", call="parser")
+        parser.escalation = bool(policy.escalate)
+    arena.routing = policy
+    return policy
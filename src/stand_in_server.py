@@ -0,0 +1,192 @@
+import argparse
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+
+# Answers that keep every game in game_configs moving; the first pattern found anywhere in the prompt wins
+DEFAULT_RESPONSES = [
+    {"pattern": r"think step-by-step", "content": "I should keep my answer short and follow the rules."},
+    {"pattern": r"cooperate or defect", "content": ["cooperate", "defect"]},
+    {"pattern": r"How many points", "content": ["0", "20", "50"]},
+    {"pattern": r"Say only yes or no", "content": ["yes", "no"]},
+    {"pattern": r"guess the word", "content": ["correct", "incorrect"]},
+    {"pattern": r"name of the player", "content": ["Player 1", "Player 2", "Player 3"]},
+    {"pattern": r"Now vote", "content": ["I vote for Player 1.", "I vote for Player 2.", "I vote for Player 3."]},
+    {"pattern": r"DECISION: cooperate", "content": ["I will cooperate.\nDECISION: cooperate", "I will defect.\nDECISION: defect"]},
+    {"pattern": r"CONTRIBUTE: <points>", "content": ["I contribute 10.\nCONTRIBUTE: 10", "I contribute 50.\nCONTRIBUTE: 50"]},
+    {"pattern": r"Prisoners' Dilemma", "content": ["Cooperate.", "Defect."]},
+    {"pattern": r"Public Good", "content": ["I contribute 10.", "I contribute 50."]},
+]
+DEFAULT_CONFIG = {
+    "latency": {"distribution": "lognormal", "median": 0.8, "sigma": 0.6},
+    "tokens_per_second": 60.0,
+    "error_rate": 0.0,
+    "rate_limit_rate": 0.0,
+    "responses": DEFAULT_RESPONSES,
+    "default_response": "Once upon a time there was a <b>Wolf</b>.",
+    "seed": None,
+}
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class StandIn:
+    """Simulated chat-completions model: samples latency, injects failures and picks scripted answers."""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+        self.rng = random.Random(self.config["seed"])
+        self.responses = [(re.compile(r["pattern"], re.IGNORECASE), r["content"]) for r in self.config["responses"]]
+        self._lock = threading.Lock()
+
+    def sample_latency(self) -> float:
+        """Seconds until the first token."""
+        latency = self.config["latency"]
+        distribution = latency["distribution"]
+        with self._lock:
+            if distribution == "fixed":
+                return latency["seconds"]
+            if distribution == "uniform":
+                return self.rng.uniform(latency["low"], latency["high"])
+            if distribution == "exponential":
+                return self.rng.expovariate(1 / latency["mean"])
+            if distribution == "lognormal":
+                return latency["median"] * self.rng.lognormvariate(0, latency["sigma"])
+        raise ValueError(f"Unknown latency distribution: {distribution}")
+
+    def sample_failure(self) -> Optional[int]:
+        with self._lock:
+            roll = self.rng.random()
+        if roll < self.config["rate_limit_rate"]:
+            return 429
+        if roll < self.config["rate_limit_rate"] + self.config["error_rate"]:
+            return 500
+        return None
+
+    def answer(self, messages: List[Dict[str, str]]) -> str:
+        prompt = "\n".join(m.get("content") or "" for m in messages)
+        for pattern, content in self.responses:
+            if pattern.search(prompt):
+                if isinstance(content, list):
+                    with self._lock:
+                        return self.rng.choice(content)
+                return content
+        return self.config["default_response"]
+
+    def _answer_and_usage(self, request: Dict[str, Any]):
+        messages = request.get("messages", [])
+        content = self.answer(messages)
+        max_tokens = request.get("max_tokens")
+        if max_tokens:
+            content = content[:4 * max_tokens]
+        prompt_tokens = sum(estimate_tokens(m.get("content") or "") for m in messages)
+        completion_tokens = estimate_tokens(content)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        return content, usage
+
+    def complete(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        content, usage = self._answer_and_usage(request)
+        time.sleep(self.sample_latency() + usage["completion_tokens"] / self.config["tokens_per_second"])
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stand-in"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    def stream(self, request: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """`complete` as chat.completion.chunk events: one per word, paced at `tokens_per_second`."""
+        content, usage = self._answer_and_usage(request)
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": request.get("model", "stand-in")}
+        time.sleep(self.sample_latency())
+        for word in re.findall(r"\S+\s*|\s+", content):
+            time.sleep(estimate_tokens(word) / self.config["tokens_per_second"])
+            yield {**base, "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+        yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        if (request.get("stream_options") or {}).get("include_usage"):
+            yield {**base, "choices": [], "usage": usage}
+
+
+def make_handler(stand_in: StandIn):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            try:
+                self.end_headers()
+                self.wfile.write(payload)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client gave up, e.g. a cancelled hedge request
+
+        def _send_stream(self, chunks: Iterator[Dict[str, Any]]):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")  # the stream's length is unknown, so its end closes the connection
+            self.close_connection = True
+            try:
+                self.end_headers()
+                for chunk in chunks:
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+                return
+            failure = stand_in.sample_failure()
+            if failure == 429:
+                self._send(429, {"error": {"message": "Rate limit reached (injected)", "type": "rate_limit_error"}}, {"retry-after": "1"})
+            elif failure:
+                self._send(failure, {"error": {"message": "Server error (injected)", "type": "server_error"}})
+            elif request.get("stream"):
+                self._send_stream(stand_in.stream(request))
+            else:
+                self._send(200, stand_in.complete(request))
+
+        def log_message(self, format, *args):
+            logging.debug(format, *args)
+
+    return Handler
+
+
+def serve(config: Optional[Dict[str, Any]] = None, host: str = "127.0.0.1", port: int = 8000) -> ThreadingHTTPServer:
+    """Creates the server; call `serve_forever()` on it, or run it on a thread for in-process load tests."""
+    return ThreadingHTTPServer((host, port), make_handler(StandIn(config)))
+
+
+if __name__ == '__main__':
+    argparser = argparse.ArgumentParser(description="Local OpenAI-compatible chat-completions server for offline load testing. "
+                                        "Point a game config at it with \"openai_base_url\": \"http://127.0.0.1:8000/v1\".")
+    argparser.add_argument("--config", help="json file overriding DEFAULT_CONFIG (latency, tokens_per_second, error_rate, rate_limit_rate, responses)")
+    argparser.add_argument("--host", default="127.0.0.1")
+    argparser.add_argument("--port", type=int, default=8000)
+    args = argparser.parse_args()
+    config = None
+    if args.config:
+        with open(args.config) as f:
+            config = json.load(f)
+    logging.basicConfig(level=logging.INFO)
+    server = serve(config, args.host, args.port)
+    logging.info(f"Stand-in server listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
@@ -0,0 +1,62 @@
+import contextlib
+import contextvars
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from chatarena.message import Message
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Chat-completions overhead of each message, on top of its content
+MESSAGE_OVERHEAD = 4
+
+# The history messages a player's query in progress sends, whose cached counts estimate its prompts
+_prompt_history: contextvars.ContextVar[Optional[List[Message]]] = contextvars.ContextVar("prompt_history", default=None)
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: Optional[str]):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except (KeyError, TypeError):
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Tokens of `text` for `model`; without tiktoken, a four-characters-per-token estimate."""
+    if tiktoken is None:
+        return len(text) // 4
+    return len(_encoding(model).encode(text, disallowed_special=()))
+
+
+def message_tokens(message: Message, model: Optional[str] = None) -> int:
+    """Tokens of a history message, counted once per model and cached on the message itself."""
+    counts: Dict[Optional[str], int] = message.__dict__.setdefault("_token_counts", {})
+    # Messages are not edited once sent, but a changed content must not reuse a stale count
+    if message.__dict__.get("_counted_content") is not message.content:
+        counts.clear()
+        message.__dict__["_counted_content"] = message.content
+    if model not in counts:
+        counts[model] = count_tokens(message.content, model) + MESSAGE_OVERHEAD
+    return counts[model]
+
+
+def history_tokens(messages: List[Message], model: Optional[str] = None) -> int:
+    return sum(message_tokens(message, model) for message in messages)
+
+
+def current_prompt_history() -> Optional[List[Message]]:
+    return _prompt_history.get()
+
+
+@contextlib.contextmanager
+def prompt_history(messages: Optional[List[Message]]):
+    """Completions made in this block send `messages` as their history; None for those that send something else."""
+    token = _prompt_history.set(messages)
+    try:
+        yield
+    finally:
+        _prompt_history.reset(token)
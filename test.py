@@ -1,18 +1,14 @@
+import json
 import logging
+import os
 
-from chatarena.arena import Arena
 from chatarena.backends.openai import OpenAIChat
 from src.agents.react import ReActWrapper
+from src.arena import Arena, log_react_agent_reasoning
+from src.instrumentation import instrument
 
 logging.basicConfig(level=logging.INFO)
 
-def log_react_agent_reasoning(arena: Arena) -> None:
-    message_pool = arena.environment.message_pool
-    for player in arena.players:
-        if isinstance(player.backend, ReActWrapper):
-            player.backend.message_pool = message_pool
-
-
 def upgrade_to_gpt4(arena: Arena) -> None:
     for player in arena.players:
         backend = player.backend
@@ -21,9 +17,20 @@ def upgrade_to_gpt4(arena: Arena) -> None:
         if isinstance(backend, OpenAIChat):
             backend.model = 'gpt-4-1106-preview'
 
+CHECKPOINT = 'checkpoint.pkl.gz'
+
 if __name__ == '__main__':
-    arena = Arena.from_config('game_configs/once_upon_a_time.json')
-    log_react_agent_reasoning(arena)
-    upgrade_to_gpt4(arena)
-    arena.run(num_steps=40)
-    arena.save_history('history.json')
\ No newline at end of file
+    if os.path.exists(CHECKPOINT):
+        arena = Arena.load_checkpoint(CHECKPOINT)
+        logging.info(f"Resuming from {CHECKPOINT} after {arena.steps_taken} steps")
+    else:
+        arena = Arena.from_config('game_configs/once_upon_a_time.json')
+        log_react_agent_reasoning(arena)
+        upgrade_to_gpt4(arena)
+        instrument(arena)
+    arena.run(num_steps=40 - arena.steps_taken, checkpoint=CHECKPOINT)
+    arena.save_history('history.json')
+    logging.info(json.dumps(arena.instrumentation.summary(), indent=4))
+    with open('metrics.prom', 'w') as f:
+        f.write(arena.instrumentation.to_openmetrics())
+    os.remove(CHECKPOINT)
\ No newline at end of file